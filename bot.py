@@ -1,34 +1,259 @@
 # Primary bot file. RUN THIS FILE TO START THE BOT
 
-import os
+import asyncio
+import time
 import discord
-from discord import Intents
+from discord import app_commands, Intents
 from discord.ext import commands
 from dotenv import load_dotenv
 
-import pymysql as mariadb
+from utils.config import BotConfig, ConfigError
+from utils.fastpath import ResponseStats
+from utils.breaker import CircuitBreaker
+from utils.db import ConnectionPool, DatabaseRouter
+from utils.invalidation import DatabaseInvalidationLog, InvalidationBus
+from utils.lifecycle import Lifecycle
+from utils.pagination import PageCache
+from utils.permissions import Authorizer
+from utils.ratelimit import RateLimiter
+from utils.singleflight import SingleFlight
+from utils.snapshot import OfflineSnapshot
+from utils.stall_card import StallCardRenderer
+from utils.stall_directory import StallDirectory
+from utils.textsig import SimHashIndex
 
 load_dotenv()
-TOKEN = os.getenv('DISCORD_TOKEN')
-
-FURRYVILLE_ID = os.getenv('FURRYVILLE_ID')
-BTG_ID = os.getenv('BTG_ID')
 
 intents = Intents.default()
 intents.message_content = False
 
-class FviClient(commands.Bot):
-    def __init__(self,):
-        super().__init__(command_prefix='!', intents=intents)
-    
+class FviTree(app_commands.CommandTree):
+    """Command tree that refuses new work while draining and counts in-flight commands"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if self.client.lifecycle.draining:
+            if interaction.type is discord.InteractionType.application_command:
+                await interaction.response.send_message("♻️ The bot is restarting, please try again in a moment.", ephemeral=True)
+            return False
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        # Transformers raise ValueError with a user-facing reason, e.g. a stall number with too many decimals
+        if isinstance(error, app_commands.TransformerError) and isinstance(error.__cause__, ValueError):
+            embed = discord.Embed(title="Invalid Input", description=str(error.__cause__), color=0xe74c3c)
+            if interaction.response.is_done():
+                await interaction.followup.send(embed=embed, ephemeral=True)
+            else:
+                await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        await super().on_error(interaction, error)
+
+    async def _call(self, interaction: discord.Interaction):
+        async with self.client.lifecycle.track():
+            await super()._call(interaction)
+
+class FviClient(commands.AutoShardedBot):
+    def __init__(self, config: BotConfig):
+        # One shard behaves like a plain Bot; AUTO_SHARD lets Discord (or SHARD_COUNT) decide
+        super().__init__(
+            command_prefix='!',
+            intents=intents,
+            tree_cls=FviTree,
+            shard_count=config.shard_count if config.auto_shard else 1
+        )
+        self.config = config
+
+        # Shared state lives on the bot so it survives reload_extension
+        self.lifecycle = Lifecycle()
+        self.db_pool = DatabaseRouter(
+            self.create_pool(config.db_host),
+            [self.create_pool(host) for host in config.db_replica_hosts],
+            config.read_your_writes
+        )
+        self.authorizer = Authorizer(config.owner_id, config.bot_role_ids)
+        self.rate_limiter = RateLimiter(config.rate_limits) if config.rate_limit_enabled else None
+        self.single_flight = SingleFlight()
+        self.response_stats = ResponseStats()
+        self.stall_cards = StallCardRenderer(config.stall_card_cache_size)
+        self.stall_pages = PageCache()  # /stalllist pages, prefetched one ahead
+        self.review_index = SimHashIndex(config.review_index_capacity, config.review_duplicate_distance)
+        self.snapshot = OfflineSnapshot(config.snapshot_path if config.snapshot_enabled else None)
+        self.snapshot_task = None
+        self.stall_directory = StallDirectory(self.db_pool)  # Never loaded, so always missing, when disabled
+        self.stall_directory_task = None
+
+        # Other processes' edits arrive through the log; this process's own are delivered directly
+        log = DatabaseInvalidationLog(self.db_pool) if config.invalidation_backend == "database" else None
+        self.invalidation = InvalidationBus(config.instance_id, log)
+        self.invalidation.subscribe("stall", self.stall_cards.invalidate)
+        self.invalidation.subscribe("stall", self.stall_directory.invalidate)
+        self.invalidation.subscribe("stall", self.stall_pages.clear)
+        self.invalidation_task = None
+        self.caches = {}
+
+    def create_pool(self, host: str) -> ConnectionPool:
+        """Connection pool for the primary or a replica, given as host or host:port"""
+        config = self.config
+        host, _, port = host.partition(":")
+        return ConnectionPool(
+            max_size=config.db_pool_size,
+            acquire_timeout=config.db_acquire_timeout,
+            breaker=CircuitBreaker(config.db_breaker_threshold, config.db_breaker_reset),
+            read_retries=config.db_read_retries,
+            retry_delay=config.db_retry_delay,
+            user=config.db_user,
+            password=config.db_password,
+            host=host,
+            port=int(port) if port else 3306,
+            database=config.db_name,
+            connect_timeout=config.db_connect_timeout
+        )
+
+    def shared_cache(self, name: str, factory):
+        """Get a named cache from the bot, creating it on first use"""
+        if name not in self.caches:
+            self.caches[name] = factory()
+        return self.caches[name]
+
+    def _refresh_snapshot(self):
+        """Rebuild the offline snapshot from a pooled connection (blocking, run in a worker thread)"""
+        conn = self.db_pool.get_connection(read_only=True, replica=True)
+        try:
+            self.snapshot.refresh(conn)
+        finally:
+            conn.close()
+
+    async def refresh_snapshot_loop(self):
+        """Keep the offline snapshot fresh while the database is up"""
+        while True:
+            try:
+                started = time.perf_counter()
+                await asyncio.to_thread(self._refresh_snapshot)
+                print(f"💾 Offline snapshot refreshed in {time.perf_counter() - started:.1f}s.")
+            except Exception as e:
+                # Keep serving the previous snapshot; that's the point of having one
+                print(f"⚠️ Offline snapshot refresh failed: {e}")
+            await asyncio.sleep(self.config.snapshot_interval)
+
+    async def invalidation_poll_loop(self):
+        """Apply cache invalidations made by other bot processes, within about one poll interval"""
+        while True:
+            try:
+                for topic, key in await asyncio.to_thread(self.invalidation.poll):
+                    self.invalidation.deliver(topic, *key)
+            except Exception as e:
+                print(f"⚠️ Invalidation poll failed: {e}")
+            await asyncio.sleep(self.config.invalidation_poll_interval)
+
+    async def stall_directory_loop(self):
+        """Load every stall into memory, then follow the change feed"""
+        while True:
+            try:
+                started = time.perf_counter()
+                loading = not self.stall_directory.ready
+                applied = await asyncio.to_thread(self.stall_directory.sync)
+                if loading:
+                    print(f"📇 Stall directory loaded {len(self.stall_directory)} stall(s) in {time.perf_counter() - started:.1f}s.")
+                elif applied:
+                    print(f"📇 Stall directory applied {applied} change(s).")
+            except Exception as e:
+                # Lookups keep falling back to the database until the feed is readable again
+                print(f"⚠️ Stall directory sync failed: {e}")
+            await asyncio.sleep(self.config.stall_directory_interval)
+
+    def _query_guild_ids(self) -> list:
+        """Enabled guilds from the bot_guilds table (blocking, run in a worker thread)"""
+        conn = self.db_pool.get_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT GuildID FROM bot_guilds WHERE Enabled = 1")
+            guild_ids = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            return guild_ids
+        finally:
+            conn.close()
+
+    async def load_guild_ids(self) -> list:
+        """Guilds to sync commands to: the configured ones plus, optionally, the bot_guilds table"""
+        guild_ids = list(self.config.guild_ids)
+        if self.config.guilds_from_db:
+            try:
+                guild_ids += await asyncio.to_thread(self._query_guild_ids)
+            except Exception as e:
+                print(f"⚠️ Could not load guilds from the database, using configured guilds only: {e}")
+        return list(dict.fromkeys(guild_ids))
+
+    async def sync_guilds(self, guild_ids: list):
+        """Sync slash commands to every guild concurrently. Each guild has its own rate limit bucket"""
+        semaphore = asyncio.Semaphore(self.config.sync_concurrency)
+
+        async def sync_one(guild_id):
+            async with semaphore:
+                guild = discord.Object(id=guild_id)
+                self.tree.copy_global_to(guild=guild)
+                await self.tree.sync(guild=guild)
+                print(f"🔧 Slash commands synced to guild {guild_id}.")
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(sync_one(guild_id) for guild_id in guild_ids), return_exceptions=True)
+        for guild_id, result in zip(guild_ids, results):
+            if isinstance(result, Exception):
+                print(f"❌ Failed to sync slash commands to guild {guild_id}: {result}")
+        print(f"✅ Finished syncing to {len(guild_ids)} guild(s) in {time.perf_counter() - started:.1f}s.")
+
+    def track_component_interactions(self):
+        """Give button clicks and modal submits the same drain handling as slash commands
+
+        discord.py dispatches them through the connection's view store rather than the command
+        tree, running each callback as a task registered with add_task. Wrapping the store refuses
+        them while draining and counts their tasks as in-flight. The view store is private, so if a
+        discord.py update changes it, components go untracked instead of breaking startup.
+        """
+        store = getattr(self._connection, "_view_store", None)
+        if not all(callable(getattr(store, name, None)) for name in ("dispatch_view", "dispatch_modal", "add_task")):
+            print("⚠️ discord.py's view store has changed, buttons and modals won't be drained on restart.")
+            return
+        dispatch_view, dispatch_modal, add_task = store.dispatch_view, store.dispatch_modal, store.add_task
+
+        def refuse(interaction: discord.Interaction) -> bool:
+            if not self.lifecycle.draining:
+                return False
+            self.loop.create_task(interaction.response.send_message("♻️ The bot is restarting, please try again in a moment.", ephemeral=True))
+            return True
+
+        def tracked_dispatch_view(component_type, custom_id, interaction):
+            if not refuse(interaction):
+                dispatch_view(component_type, custom_id, interaction)
+
+        def tracked_dispatch_modal(custom_id, interaction, components, resolved):
+            if not refuse(interaction):
+                dispatch_modal(custom_id, interaction, components, resolved)
+
+        def tracked_add_task(task):
+            add_task(task)
+            self.lifecycle.track_task(task)
+
+        store.dispatch_view = tracked_dispatch_view
+        store.dispatch_modal = tracked_dispatch_modal
+        store.add_task = tracked_add_task
+
+    async def close(self):
+        """Drain in-flight interactions and close the pool before disconnecting"""
+        if not self.lifecycle.draining:
+            print("⏳ Draining in-flight interactions...")
+            if not await self.lifecycle.drain(self.config.drain_deadline):
+                print(f"⚠️ {self.lifecycle.in_flight} interaction(s) still running after {self.config.drain_deadline}s, shutting down anyway.")
+
+            for task in (self.snapshot_task, self.invalidation_task, self.stall_directory_task):
+                if task:
+                    task.cancel()
+            self.db_pool.close()
+            print("✅ Drained, closing connection.")
+        await super().close()
+
     async def setup_hook(self):
-        # Initialize the database connection
-        # print("🔗 Intializing DB connection...")
-        # try:
-        #     mariadb.init()
-        # except Exception as e:
-        #     print(f"Error initializing database connection: {e}")
-        #     return
+        self.track_component_interactions()
+
         # Load cogs
         print("🔧 Loading cogs...")
         await self.load_extension('cogs.maintenance')
@@ -36,22 +261,25 @@ class FviClient(commands.Bot):
         await self.load_extension('cogs.entry_create')
         await self.load_extension('cogs.entry_edit')
         await self.load_extension('cogs.entry_review')
+        await self.load_extension('cogs.review_manage')
         # await self.load_extension('cogs.test')
 
-        guild_ids = [
-            BTG_ID,
-            FURRYVILLE_ID
-        ]
-        
-        for guild_id in guild_ids:
-            guild = discord.Object(id=guild_id)
-            self.tree.copy_global_to(guild=guild)
-            await self.tree.sync(guild=guild)
-            print(f"🔧 Slash commands synced to guild {guild_id}.")
-
-        print("✅ Finished syncing to all guilds.")
+        if self.config.snapshot_enabled:
+            self.snapshot_task = asyncio.create_task(self.refresh_snapshot_loop())
+        if self.config.stall_directory_enabled:
+            self.stall_directory_task = asyncio.create_task(self.stall_directory_loop())
+        if self.config.invalidation_backend == "database":
+            self.invalidation_task = asyncio.create_task(self.invalidation_poll_loop())
+
+        await self.sync_guilds(await self.load_guild_ids())
         print("✅ Finished loading cogs.")
 
 if __name__ == "__main__":
-    bot = FviClient()
-    bot.run(TOKEN)
\ No newline at end of file
+    # Fail fast on bad configuration instead of erroring on the first command
+    try:
+        config = BotConfig.from_env()
+    except ConfigError as e:
+        raise SystemExit(f"❌ {e}")
+
+    bot = FviClient(config)
+    bot.run(config.token)
@@ -1,62 +1,21 @@
 # Cog to handle entry creation
 
 import asyncio
-import os
 import time
+from decimal import Decimal
 import discord
 from discord import app_commands
 from discord.ext import commands
-from dotenv import load_dotenv
 import pymysql as mariadb
 
-def has_bot_permissions():
-    """Check if user has the required role or is the bot owner"""
-    async def predicate(interaction: discord.Interaction) -> bool:
-        # Get environment variables
-        postman_id = int(os.getenv('POSTMAN_ID'))
-        bot_role_id = int(os.getenv('BOTROLE_ID'))
-        
-        # Allow POSTMAN_ID user always
-        if interaction.user.id == postman_id:
-            return True
-        
-        # Check if user has the required role
-        if hasattr(interaction.user, 'roles'):
-            for role in interaction.user.roles:
-                if role.id == bot_role_id:
-                    return True
-        
-        # If no permissions, send error message
-        embed = discord.Embed(
-            title="❌ Permission Denied",
-            description="You don't have permission to use this bot's commands.",
-            color=0xe74c3c
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-        return False
-    
-    return app_commands.check(predicate)
-
-class StreetNameTransformer(app_commands.Transformer):
-    """Transformer for street name autocomplete"""
-    
-    VALID_STREETS = [
-        "Wall Street",
-        "Artist Alley", 
-        "Woke Ave",
-        "Five",
-        "Poland Street"
-    ]
-    
-    async def transform(self, interaction: discord.Interaction, value: str) -> str:
-        return value
-    
-    async def autocomplete(self, interaction: discord.Interaction, value: str) -> list[app_commands.Choice[str]]:
-        return [
-            app_commands.Choice(name=street, value=street)
-            for street in self.VALID_STREETS
-            if value.lower() in street.lower()
-        ][:25]
+from utils.audit import record_change
+from utils.change_feed import NEXT_ROW_VERSION
+from utils.permissions import has_bot_permissions
+from utils.ratelimit import rate_limited
+from utils.snapshot import OFFLINE_WRITE_ERROR
+from utils.stall_card import build_stall_embed, format_stall_number
+from utils.stall_number import StallNumberTransformer, parse_stall_number
+from utils.streets import VALID_STREETS, StreetNameTransformer
 
 class StallCreationModal(discord.ui.Modal):
     """Modal for creating stall entries"""
@@ -127,11 +86,11 @@ class StallCreationModal(discord.ui.Modal):
                 if stall_num <= 0:
                     raise ValueError("Stall number must be positive")
             else:
-                # The Mall allows floating point numbers
-                stall_num = float(self.stall_number.value)
+                # The Mall allows decimals, stored exactly
+                stall_num = parse_stall_number(self.stall_number.value)
                 if stall_num <= 0:
                     raise ValueError("Stall number must be positive")
-        except ValueError:
+        except ValueError as e:
             if self.table_name == "warp_hall":
                 embed = discord.Embed(
                     title="Invalid Stall Number",
@@ -139,9 +98,10 @@ class StallCreationModal(discord.ui.Modal):
                     color=0xe74c3c
                 )
             else:
+                # parse_stall_number explains what's wrong, e.g. too many decimal places
                 embed = discord.Embed(
                     title="Invalid Stall Number",
-                    description="Stall number must be a positive number for The Mall.",
+                    description=f"{e} Stall number must be a positive number for The Mall.",
                     color=0xe74c3c
                 )
             await interaction.followup.send(embed=embed, ephemeral=True)
@@ -149,10 +109,10 @@ class StallCreationModal(discord.ui.Modal):
         
         # Validate street name for The Mall
         if self.table_name == "the_mall":
-            if self.street_name.value not in StreetNameTransformer.VALID_STREETS:
+            if self.street_name.value not in VALID_STREETS:
                 embed = discord.Embed(
                     title="Invalid Street Name",
-                    description=f"Street name must be one of: {', '.join(StreetNameTransformer.VALID_STREETS)}",
+                    description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
                     color=0xe74c3c
                 )
                 await interaction.followup.send(embed=embed, ephemeral=True)
@@ -175,7 +135,7 @@ class StallCreationModal(discord.ui.Modal):
             }
         
         # Create the entry
-        result = await self.cog.create_stall_entry(self.table_name, data)
+        result = await self.cog.create_stall_entry(self.table_name, data, interaction.user.id)
         
         if result["success"]:
             embed = self.cog.create_success_embed(self.table_name, data)
@@ -193,26 +153,29 @@ class EntryCreate(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.config = bot.config
         
-    def get_db_connection(self):
-        """Get database connection"""
+    def get_db_connection(self, read_only: bool = False, replica: bool = False):
+        """Get a database connection from the bot's shared pool"""
         try:
-            conn = mariadb.connect(
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                host="furryville-index.db",
-                database="furryville"
-            )
-            return conn
+            return self.bot.db_pool.get_connection(read_only, replica)
         except mariadb.Error as e:
             print(f"Error connecting to MariaDB: {e}")
             return None
 
-    async def create_stall_entry(self, table_name: str, data: dict) -> dict:
+    async def create_stall_entry(self, table_name: str, data: dict, changed_by: int = None) -> dict:
         """Create a new stall entry in the database"""
+        result = await asyncio.to_thread(self._create_stall_entry, table_name, data, changed_by)
+        if result["success"]:
+            # Cache subscribers live on the event loop, so deliver here rather than in the worker thread
+            self.bot.invalidation.deliver("stall", table_name, data["StallNumber"], data.get("StreetName"))
+        return result
+
+    def _create_stall_entry(self, table_name: str, data: dict, changed_by: int = None) -> dict:
+        """Create a new stall entry in the database (blocking, run in a worker thread)"""
         conn = self.get_db_connection()
         if not conn:
-            return {"success": False, "error": "Database connection failed"}
+            return {"success": False, "error": OFFLINE_WRITE_ERROR}
         
         try:
             cursor = conn.cursor()
@@ -225,10 +188,10 @@ class EntryCreate(commands.Cog):
                 if cursor.fetchone():
                     cursor.close()
                     conn.close()
-                    return {"success": False, "error": f"Stall number {data['StallNumber']} already exists in Warp Hall"}
+                    return {"success": False, "error": f"Stall number {format_stall_number(data['StallNumber'])} already exists in Warp Hall"}
                 
                 # Insert the new entry
-                insert_query = "INSERT INTO warp_hall (StallNumber, IGN, StallName) VALUES (%s, %s, %s)"
+                insert_query = f"INSERT INTO warp_hall (StallNumber, IGN, StallName, RowVersion) VALUES (%s, %s, %s, {NEXT_ROW_VERSION})"
                 values = (data["StallNumber"], data["IGN"], data["StallName"])
                 
             else:  # the_mall
@@ -238,18 +201,21 @@ class EntryCreate(commands.Cog):
                 if cursor.fetchone():
                     cursor.close()
                     conn.close()
-                    return {"success": False, "error": f"Stall number {data['StallNumber']} already exists on {data['StreetName']}"}
+                    return {"success": False, "error": f"Stall number {format_stall_number(data['StallNumber'])} already exists on {data['StreetName']}"}
                 
                 # Insert the new entry
-                insert_query = "INSERT INTO the_mall (StallNumber, StreetName, IGN, StallName, ItemsSold) VALUES (%s, %s, %s, %s, %s)"
+                insert_query = f"INSERT INTO the_mall (StallNumber, StreetName, IGN, StallName, ItemsSold, RowVersion) VALUES (%s, %s, %s, %s, %s, {NEXT_ROW_VERSION})"
                 values = (data["StallNumber"], data["StreetName"], data["IGN"], data["StallName"], data["ItemsSold"])
             
             cursor.execute(insert_query, values)
+            record_change(cursor, table_name, data["StallNumber"], data.get("StreetName"), "create", changed_by, after=data)
+            self.bot.invalidation.broadcast(cursor, "stall", table_name, data["StallNumber"], data.get("StreetName"))
             conn.commit()
             
             cursor.close()
             conn.close()
             
+            self.bot.db_pool.record_write(changed_by)
             return {"success": True}
             
         except mariadb.Error as e:
@@ -260,34 +226,9 @@ class EntryCreate(commands.Cog):
 
     def create_success_embed(self, table_name: str, data: dict) -> discord.Embed:
         """Create a success embed for the created stall"""
-        # Format stall number to display as integer if it's a whole number
-        stall_number = data["StallNumber"]
-        if isinstance(stall_number, float) and stall_number.is_integer():
-            stall_number_display = str(int(stall_number))
-        else:
-            stall_number_display = str(stall_number)
-        
-        if table_name == "warp_hall":
-            embed = discord.Embed(
-                title="✅ Warp Hall Stall Created Successfully!",
-                color=0x00ff00
-            )
-            embed.add_field(name="Stall Number", value=stall_number_display, inline=True)
-            embed.add_field(name="Owner IGN", value=data["IGN"], inline=True)
-            embed.add_field(name="Stall Name", value=data["StallName"], inline=True)
-        else:  # the_mall
-            embed = discord.Embed(
-                title="✅ The Mall Stall Created Successfully!",
-                color=0x00ff00
-            )
-            embed.add_field(name="Stall Number", value=stall_number_display, inline=True)
-            embed.add_field(name="Street Name", value=data["StreetName"], inline=True)
-            embed.add_field(name="Owner IGN", value=data["IGN"], inline=True)
-            embed.add_field(name="Stall Name", value=data["StallName"], inline=False)
-            embed.add_field(name="Items Sold", value=data["ItemsSold"], inline=False)
-        
-        embed.set_footer(text="Furryville Index Database")
-        return embed
+        title = "✅ Warp Hall Stall Created Successfully!" if table_name == "warp_hall" else "✅ The Mall Stall Created Successfully!"
+        wide_columns = ("StallName", "ItemsSold") if table_name == "the_mall" else ()
+        return build_stall_embed(table_name, data, title, 0x00ff00, wide_columns)
 
     @app_commands.command(name="stallcreate", description="Create a new stall entry using an interactive form")
     @app_commands.describe(table="Choose which location to create a stall in")
@@ -295,6 +236,7 @@ class EntryCreate(commands.Cog):
         app_commands.Choice(name="Warp Hall", value="warp_hall"),
         app_commands.Choice(name="The Mall", value="the_mall")
     ])
+    @rate_limited("write")
     @has_bot_permissions()
     async def stallcreate(self, interaction: discord.Interaction, table: app_commands.Choice[str]):
         """Create a new stall entry using an interactive modal form"""
@@ -309,11 +251,12 @@ class EntryCreate(commands.Cog):
         stall_name="Name of the stall",
         items_sold="Items sold at this stall"
     )
+    @rate_limited("write")
     @has_bot_permissions()
     async def stallcreatetm(
         self, 
         interaction: discord.Interaction, 
-        stall_number: float,
+        stall_number: app_commands.Transform[Decimal, StallNumberTransformer],
         street_name: app_commands.Transform[str, StreetNameTransformer],
         ign: str,
         stall_name: str,
@@ -333,10 +276,10 @@ class EntryCreate(commands.Cog):
             return
         
         # Validate street name
-        if street_name not in StreetNameTransformer.VALID_STREETS:
+        if street_name not in VALID_STREETS:
             embed = discord.Embed(
                 title="Invalid Street Name",
-                description=f"Street name must be one of: {', '.join(StreetNameTransformer.VALID_STREETS)}",
+                description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
                 color=0xe74c3c
             )
             await interaction.followup.send(embed=embed, ephemeral=True)
@@ -352,7 +295,7 @@ class EntryCreate(commands.Cog):
         }
         
         # Create the entry
-        result = await self.create_stall_entry("the_mall", data)
+        result = await self.create_stall_entry("the_mall", data, interaction.user.id)
         
         if result["success"]:
             embed = self.create_success_embed("the_mall", data)
@@ -371,6 +314,7 @@ class EntryCreate(commands.Cog):
         ign="Owner's in-game name",
         stall_name="Name of the stall"
     )
+    @rate_limited("write")
     @has_bot_permissions()
     async def stallcreatewh(
         self,
@@ -400,7 +344,7 @@ class EntryCreate(commands.Cog):
         }
         
         # Create the entry
-        result = await self.create_stall_entry("warp_hall", data)
+        result = await self.create_stall_entry("warp_hall", data, interaction.user.id)
         
         if result["success"]:
             embed = self.create_success_embed("warp_hall", data)
@@ -1,75 +1,55 @@
 # Cog to handle entry edits
 
 import asyncio
-import os
 import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
 import discord
 from discord import app_commands
 from discord.ext import commands
-from dotenv import load_dotenv
 import pymysql as mariadb
 
-def has_bot_permissions():
-    """Check if user has the required role or is the bot owner"""
-    async def predicate(interaction: discord.Interaction) -> bool:
-        # Get environment variables
-        postman_id = int(os.getenv('POSTMAN_ID'))
-        bot_role_id = int(os.getenv('BOTROLE_ID'))
-        
-        # Allow POSTMAN_ID user always
-        if interaction.user.id == postman_id:
-            return True
-        
-        # Check if user has the required role
-        if hasattr(interaction.user, 'roles'):
-            for role in interaction.user.roles:
-                if role.id == bot_role_id:
-                    return True
-        
-        # If no permissions, send error message
-        embed = discord.Embed(
-            title="❌ Permission Denied",
-            description="You don't have permission to use this bot's commands.",
-            color=0xe74c3c
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-        return False
-    
-    return app_commands.check(predicate)
+from utils.audit import audit_row, describe_change, record_change, record_changes
+from utils.change_feed import NEXT_ROW_VERSION, record_tombstone
+from utils.permissions import has_bot_permissions, require_moderator
+from utils.ratelimit import rate_limited
+from utils.snapshot import OFFLINE_WRITE_ERROR
+from utils.stall_card import STALL_FIELDS, build_stall_embed, format_stall_number
+from utils.stall_number import StallNumberTransformer, is_whole_number, parse_stall_number
+from utils.streets import VALID_STREETS, StreetNameTransformer
 
-class StreetSelectionView(discord.ui.View):
-    """View for selecting street name when editing The Mall stalls"""
-    
-    VALID_STREETS = [
-        "Wall Street",
-        "Artist Alley", 
-        "Woke Ave",
-        "Five",
-        "Poland Street"
-    ]
+class EditStreetSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"fvi:edit:mall:(?P<stall>[0-9.]+)"):
+    """Persistent street dropdown for editing The Mall stalls. The stall number lives in the custom_id"""
     
-    def __init__(self, stall_number, cog, timeout=300):
-        super().__init__(timeout=timeout)
+    def __init__(self, stall_number):
         self.stall_number = stall_number
-        self.cog = cog
         
         # Create dropdown with street options
-        select = discord.ui.Select(
+        super().__init__(discord.ui.Select(
+            custom_id=f"fvi:edit:mall:{format_stall_number(stall_number)}",
             placeholder="Select the street name for this stall...",
             options=[
                 discord.SelectOption(label=street, value=street, description=f"Edit stall on {street}")
-                for street in self.VALID_STREETS
+                for street in VALID_STREETS
             ]
-        )
-        select.callback = self.street_selected
-        self.add_item(select)
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(parse_stall_number(match["stall"]))
     
-    async def street_selected(self, interaction: discord.Interaction):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Stateless, so re-check permissions on every use
+        return await require_moderator(interaction)
+    
+    async def callback(self, interaction: discord.Interaction):
         """Handle street selection and open edit modal"""
-        street_name = interaction.data['values'][0]
+        street_name = self.item.values[0]
+        cog = interaction.client.get_cog("EntryEdit")
         
         # Get existing stall data
-        stall_data = await self.cog.get_stall_data("the_mall", self.stall_number, street_name)
+        stall_data = await cog.load_edit_data("the_mall", self.stall_number, street_name)
         
         if "error" in stall_data:
             embed = discord.Embed(
@@ -81,9 +61,136 @@ class StreetSelectionView(discord.ui.View):
             return
         
         # Open edit modal with pre-filled data
-        modal = StallEditModal("the_mall", stall_data, self.cog)
+        modal = StallEditModal("the_mall", stall_data, cog)
         await interaction.response.send_modal(modal)
 
+class StreetSelectionView(discord.ui.View):
+    """View for selecting street name when editing The Mall stalls. Holds no state, so it never times out"""
+    
+    def __init__(self, stall_number):
+        super().__init__(timeout=None)
+        self.add_item(EditStreetSelect(stall_number))
+
+class EditFormButton(discord.ui.DynamicItem[discord.ui.Button], template=r"fvi:edit:warp:(?P<stall>[0-9]+)"):
+    """Persistent button that opens the Warp Hall edit form. The stall number lives in the custom_id"""
+    
+    def __init__(self, stall_number: int):
+        self.stall_number = stall_number
+        super().__init__(discord.ui.Button(
+            label="Open Edit Form",
+            style=discord.ButtonStyle.primary,
+            emoji="✏️",
+            custom_id=f"fvi:edit:warp:{stall_number}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["stall"]))
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await require_moderator(interaction)
+    
+    async def callback(self, interaction: discord.Interaction):
+        """Load the current stall data and open the edit modal"""
+        cog = interaction.client.get_cog("EntryEdit")
+        
+        # A cached row, or a single pooled primary-key lookup, fits comfortably inside the 3 second response window
+        stall_data = await cog.load_edit_data("warp_hall", self.stall_number)
+        
+        if "error" in stall_data:
+            embed = discord.Embed(
+                title="Error",
+                description=stall_data["error"],
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        modal = StallEditModal("warp_hall", stall_data, cog)
+        await interaction.response.send_modal(modal)
+
+class ReloadEditButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"fvi:edit:reload:(?P<table>warp_hall|the_mall):(?P<stall>[0-9.]+):(?P<street>[A-Za-z ]*)"
+):
+    """Persistent button shown after an edit conflict. Reopens the edit form with the stall's latest data"""
+    
+    def __init__(self, table_name: str, stall_number, street_name: str = None):
+        self.table_name = table_name
+        self.stall_number = stall_number
+        self.street_name = street_name or None
+        super().__init__(discord.ui.Button(
+            label="Edit Latest Version",
+            style=discord.ButtonStyle.primary,
+            emoji="🔄",
+            custom_id=f"fvi:edit:reload:{table_name}:{format_stall_number(stall_number)}:{street_name or ''}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["table"], parse_stall_number(match["stall"]), match["street"])
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await require_moderator(interaction)
+    
+    async def callback(self, interaction: discord.Interaction):
+        """Re-read the stall and open the edit modal pre-filled with it"""
+        cog = interaction.client.get_cog("EntryEdit")
+        stall_data = await cog.get_stall_data(self.table_name, self.stall_number, self.street_name)
+        
+        if "error" in stall_data:
+            embed = discord.Embed(
+                title="Error",
+                description=stall_data["error"],
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.send_modal(StallEditModal(self.table_name, stall_data, cog))
+
+HISTORY_PAGE_SIZE = 8
+HISTORY_CURSOR_FORMAT = "%Y%m%d%H%M%S%f"  # ChangedAt packed into the Older button's custom_id
+
+HISTORY_TABLES = {
+    "warp_hall": "Warp Hall Stall",
+    "the_mall": "The Mall Stall",
+    "the_mall_reviews": "Reviews for The Mall Stall",
+}
+
+class HistoryOlderButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"fvi:hist:(?P<table>[a-z_]+):(?P<stall>[0-9.]+):(?P<street>[A-Za-z ]*):(?P<at>[0-9]{20}):(?P<id>[0-9]+)"
+):
+    """Persistent button for the next page of /stallhistory. The keyset cursor lives in the custom_id"""
+    
+    def __init__(self, table_name: str, stall_number, street_name: str, changed_at, audit_id: int):
+        self.table_name = table_name
+        self.stall_number = stall_number
+        self.street_name = street_name
+        self.cursor = (changed_at, audit_id)
+        super().__init__(discord.ui.Button(
+            label="Older",
+            style=discord.ButtonStyle.secondary,
+            emoji="⏪",
+            custom_id=f"fvi:hist:{table_name}:{format_stall_number(stall_number)}:{street_name}:{changed_at.strftime(HISTORY_CURSOR_FORMAT)}:{audit_id}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        changed_at = datetime.strptime(match["at"], HISTORY_CURSOR_FORMAT)
+        return cls(match["table"], parse_stall_number(match["stall"]), match["street"], changed_at, int(match["id"]))
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await require_moderator(interaction)
+    
+    async def callback(self, interaction: discord.Interaction):
+        """Show the next page of history below the current one"""
+        await interaction.response.defer(ephemeral=True)
+        cog = interaction.client.get_cog("EntryEdit")
+        embed, view = await cog.build_history_page(self.table_name, self.stall_number, self.street_name, self.cursor)
+        await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+
 class StallEditModal(discord.ui.Modal):
     """Modal for editing stall entries with pre-filled data"""
     
@@ -92,10 +199,11 @@ class StallEditModal(discord.ui.Modal):
         self.existing_data = existing_data
         self.cog = cog
         
+        stall_display = format_stall_number(existing_data["StallNumber"]) if "StallNumber" in existing_data else "?"
         if table_name == "warp_hall":
-            title = f"Edit Warp Hall Stall #{existing_data.get('StallNumber', '?')}"
+            title = f"Edit Warp Hall Stall #{stall_display}"
         else:
-            title = f"Edit The Mall Stall #{existing_data.get('StallNumber', '?')}"
+            title = f"Edit The Mall Stall #{stall_display}"
             
         super().__init__(title=title, timeout=300)
         
@@ -157,7 +265,7 @@ class StallEditModal(discord.ui.Modal):
             return
         
         # Update the entry
-        result = await self.cog.update_stall_entry(self.table_name, self.existing_data["StallNumber"], update_data, self.existing_data.get("StreetName"))
+        result = await self.cog.update_stall_entry(self.table_name, self.existing_data, update_data, interaction.user.id)
         
         if result["success"]:
             # Get updated data for embed
@@ -166,6 +274,12 @@ class StallEditModal(discord.ui.Modal):
             
             embed = self.cog.create_edit_success_embed(self.table_name, updated_data, update_data)
             await interaction.followup.send(embed=embed)
+        elif result.get("conflict"):
+            # A modal can't answer a modal, so offer a button that reopens it with the latest values
+            embed = self.cog.create_edit_conflict_embed(self.table_name, result, update_data)
+            view = discord.ui.View(timeout=None)
+            view.add_item(ReloadEditButton(self.table_name, self.existing_data["StallNumber"], self.existing_data.get("StreetName")))
+            await interaction.followup.send(embed=embed, view=view, ephemeral=True)
         else:
             embed = discord.Embed(
                 title="Error Updating Stall",
@@ -179,23 +293,29 @@ class EntryEdit(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.config = bot.config
+
+    async def cog_load(self):
+        # Dynamic items route clicks by custom_id, so buttons keep working across restarts and reloads
+        self.bot.add_dynamic_items(EditStreetSelect, EditFormButton, ReloadEditButton, HistoryOlderButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(EditStreetSelect, EditFormButton, ReloadEditButton, HistoryOlderButton)
         
-    def get_db_connection(self):
-        """Get database connection"""
+    def get_db_connection(self, read_only: bool = False, replica: bool = False):
+        """Get a database connection from the bot's shared pool"""
         try:
-            conn = mariadb.connect(
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                host="furryville-index.db",
-                database="furryville"
-            )
-            return conn
+            return self.bot.db_pool.get_connection(read_only, replica)
         except mariadb.Error as e:
             print(f"Error connecting to MariaDB: {e}")
             return None
 
     async def get_stall_data(self, table_name: str, stall_number, street_name: str = None) -> dict:
         """Get stall data from the specified table"""
+        return await asyncio.to_thread(self._get_stall_data, table_name, stall_number, street_name)
+
+    def _get_stall_data(self, table_name: str, stall_number, street_name: str = None) -> dict:
+        """Get stall data from the specified table (blocking, run in a worker thread)"""
         conn = self.get_db_connection()
         if not conn:
             return {"error": "Database connection failed"}
@@ -204,34 +324,35 @@ class EntryEdit(commands.Cog):
             cursor = conn.cursor()
             
             if table_name == "warp_hall":
-                query = "SELECT StallNumber, IGN, StallName FROM warp_hall WHERE StallNumber = %s"
+                query = "SELECT StallNumber, IGN, StallName, RowVersion FROM warp_hall WHERE StallNumber = %s"
                 cursor.execute(query, (stall_number,))
                 result = cursor.fetchone()
                 
                 if not result:
                     cursor.close()
                     conn.close()
-                    return {"error": f"No stall found with number {stall_number} in Warp Hall"}
+                    return {"error": f"No stall found with number {format_stall_number(stall_number)} in Warp Hall"}
                 
                 cursor.close()
                 conn.close()
                 return {
                     "StallNumber": result[0],
                     "IGN": result[1],
-                    "StallName": result[2]
+                    "StallName": result[2],
+                    "RowVersion": result[3]
                 }
             
             else:  # the_mall
                 if street_name:
                     # Get specific stall by number and street
-                    query = "SELECT StallNumber, StreetName, IGN, StallName, ItemsSold FROM the_mall WHERE StallNumber = %s AND StreetName = %s"
+                    query = "SELECT StallNumber, StreetName, IGN, StallName, ItemsSold, RowVersion FROM the_mall WHERE StallNumber = %s AND StreetName = %s"
                     cursor.execute(query, (stall_number, street_name))
                     result = cursor.fetchone()
                     
                     if not result:
                         cursor.close()
                         conn.close()
-                        return {"error": f"No stall found with number {stall_number} on {street_name}"}
+                        return {"error": f"No stall found with number {format_stall_number(stall_number)} on {street_name}"}
                     
                     cursor.close()
                     conn.close()
@@ -240,7 +361,8 @@ class EntryEdit(commands.Cog):
                         "StreetName": result[1],
                         "IGN": result[2],
                         "StallName": result[3],
-                        "ItemsSold": result[4]
+                        "ItemsSold": result[4],
+                        "RowVersion": result[5]
                     }
                 else:
                     # Check if stall number exists (for street selection)
@@ -252,7 +374,7 @@ class EntryEdit(commands.Cog):
                     conn.close()
                     
                     if count == 0:
-                        return {"error": f"No stall found with number {stall_number} in The Mall"}
+                        return {"error": f"No stall found with number {format_stall_number(stall_number)} in The Mall"}
                     
                     return {"exists": True}
             
@@ -262,11 +384,35 @@ class EntryEdit(commands.Cog):
                 conn.close()
             return {"error": f"Database query failed: {str(e)}"}
 
-    async def update_stall_entry(self, table_name: str, stall_number, update_data: dict, street_name: str = None) -> dict:
-        """Update a stall entry in the database"""
+    async def load_edit_data(self, table_name: str, stall_number, street_name: str = None) -> dict:
+        """Stall data for the edit form, from the stall directory when cached
+        
+        A directory row can trail the database by a feed interval; the form's compare-and-swap save
+        catches that as an edit conflict.
+        """
+        stall_data = self.bot.stall_directory.get(table_name, stall_number, street_name)
+        if stall_data is not None:
+            return stall_data
+        return await self.get_stall_data(table_name, stall_number, street_name)
+
+    async def update_stall_entry(self, table_name: str, existing_data: dict, update_data: dict, changed_by: int = None) -> dict:
+        """Update a stall entry, only if nobody else has changed it since existing_data was read
+        
+        On a conflict returns {"success": False, "conflict": True, "latest": {...}} with the current row.
+        """
+        result = await asyncio.to_thread(self._update_stall_entry, table_name, existing_data, update_data, changed_by)
+        if result["success"]:
+            self.bot.invalidation.deliver("stall", table_name, existing_data["StallNumber"], existing_data.get("StreetName"))
+        return result
+
+    def _update_stall_entry(self, table_name: str, existing_data: dict, update_data: dict, changed_by: int = None) -> dict:
+        """Compare-and-swap update of one stall (blocking, run in a worker thread)"""
         conn = self.get_db_connection()
         if not conn:
-            return {"success": False, "error": "Database connection failed"}
+            return {"success": False, "error": OFFLINE_WRITE_ERROR}
+        
+        stall_number = existing_data["StallNumber"]
+        street_name = existing_data.get("StreetName")
         
         try:
             cursor = conn.cursor()
@@ -278,25 +424,50 @@ class EntryEdit(commands.Cog):
             for field, value in update_data.items():
                 set_clauses.append(f"{field} = %s")
                 values.append(value)
+            set_clauses.append(f"RowVersion = {NEXT_ROW_VERSION}")  # Publishes the edit on the change feed
             
             if table_name == "warp_hall":
-                query = f"UPDATE warp_hall SET {', '.join(set_clauses)} WHERE StallNumber = %s"
-                values.append(stall_number)
+                where = "StallNumber = %s"
+                key = [stall_number]
             else:  # the_mall
-                query = f"UPDATE the_mall SET {', '.join(set_clauses)} WHERE StallNumber = %s AND StreetName = %s"
-                values.extend([stall_number, street_name])
+                where = "StallNumber = %s AND StreetName = %s"
+                key = [stall_number, street_name]
             
-            cursor.execute(query, values)
+            # Compare-and-swap: the write only lands if the row is still at the version the form was
+            # filled from, so no lock is held while the moderator types. RowVersion always changes,
+            # so rowcount is 0 exactly when the version (or the row) is gone
+            cursor.execute(
+                f"UPDATE {table_name} SET {', '.join(set_clauses)} WHERE {where} AND RowVersion = %s",
+                values + key + [existing_data["RowVersion"]]
+            )
             
             if cursor.rowcount == 0:
+                conn.rollback()
+                columns = ["StallNumber", "IGN", "StallName", "RowVersion"] if table_name == "warp_hall" else \
+                    ["StallNumber", "StreetName", "IGN", "StallName", "ItemsSold", "RowVersion"]
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name} WHERE {where}", key)
+                latest = cursor.fetchone()
                 cursor.close()
                 conn.close()
-                return {"success": False, "error": "No rows were updated. Stall may not exist."}
+                
+                if not latest:
+                    return {"success": False, "error": "No rows were updated. Stall may not exist."}
+                return {
+                    "success": False,
+                    "conflict": True,
+                    "error": "Someone else edited this stall after you opened the form, so your changes were not saved.",
+                    "latest": dict(zip(columns, latest))
+                }
             
+            # The form was filled from exactly the version just replaced, so it is the audit "before"
+            before = {field: existing_data.get(field) for field in update_data}
+            record_change(cursor, table_name, stall_number, street_name, "edit", changed_by, before=before, after=update_data)
+            self.bot.invalidation.broadcast(cursor, "stall", table_name, stall_number, street_name)
             conn.commit()
             cursor.close()
             conn.close()
             
+            self.bot.db_pool.record_write(changed_by)
             return {"success": True}
             
         except mariadb.Error as e:
@@ -305,33 +476,169 @@ class EntryEdit(commands.Cog):
                 conn.close()
             return {"success": False, "error": f"Database error: {str(e)}"}
 
-    def create_edit_success_embed(self, table_name: str, stall_data: dict, updated_fields: dict) -> discord.Embed:
-        """Create a success embed for the edited stall"""
-        # Format stall number to display as integer if it's a whole number
-        stall_number = stall_data["StallNumber"]
-        if isinstance(stall_number, float) and stall_number.is_integer():
-            stall_number_display = str(int(stall_number))
-        else:
-            stall_number_display = str(stall_number)
+    async def move_stall_entry(self, stall_number, street_name: str, new_stall_number, new_street_name: str, changed_by: int = None) -> dict:
+        """Renumber and/or move a The Mall stall along with its reviews"""
+        result = await asyncio.to_thread(self._move_stall_entry, stall_number, street_name, new_stall_number, new_street_name, changed_by)
+        if result["success"]:
+            self.bot.invalidation.deliver("stall", "the_mall", stall_number, street_name)
+            self.bot.invalidation.deliver("stall", "the_mall", new_stall_number, new_street_name)
+            
+            # Re-key the stall's reviews in the duplicate index so they aren't matched against themselves
+            index = self.bot.review_index
+            for key in index.keys():
+                if key[1:] == (stall_number, street_name):
+                    index.rekey(key, (key[0], new_stall_number, new_street_name))
+        return result
+
+    def _move_stall_entry(self, stall_number, street_name: str, new_stall_number, new_street_name: str, changed_by: int = None) -> dict:
+        """Change a stall's key and rewrite its reviews in one transaction (blocking, run in a worker thread)"""
+        conn = self.get_db_connection()
+        if not conn:
+            return {"success": False, "error": OFFLINE_WRITE_ERROR}
         
-        if table_name == "warp_hall":
-            embed = discord.Embed(
-                title="✅ Warp Hall Stall Updated Successfully!",
-                color=0x00ff00
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                "SELECT StallNumber, StreetName, IGN, StallName, ItemsSold FROM the_mall WHERE StallNumber = %s AND StreetName = %s FOR UPDATE",
+                (stall_number, street_name)
             )
-            embed.add_field(name="Stall Number", value=stall_number_display, inline=True)
-            embed.add_field(name="Owner IGN", value=stall_data["IGN"], inline=True)
-            embed.add_field(name="Stall Name", value=stall_data["StallName"], inline=True)
-        else:  # the_mall
-            embed = discord.Embed(
-                title="✅ The Mall Stall Updated Successfully!",
-                color=0x00ff00
+            existing = cursor.fetchone()
+            if not existing:
+                cursor.close()
+                conn.close()
+                return {"success": False, "error": f"No stall found with number {format_stall_number(stall_number)} on {street_name}"}
+            
+            cursor.execute(
+                "SELECT StallNumber FROM the_mall WHERE StallNumber = %s AND StreetName = %s FOR UPDATE",
+                (new_stall_number, new_street_name)
             )
-            embed.add_field(name="Stall Number", value=stall_number_display, inline=True)
-            embed.add_field(name="Street Name", value=stall_data["StreetName"], inline=True)
-            embed.add_field(name="Owner IGN", value=stall_data["IGN"], inline=True)
-            embed.add_field(name="Stall Name", value=stall_data["StallName"], inline=False)
-            embed.add_field(name="Items Sold", value=stall_data["ItemsSold"], inline=False)
+            if cursor.fetchone():
+                cursor.close()
+                conn.close()
+                return {"success": False, "error": f"Stall number {format_stall_number(new_stall_number)} already exists on {new_street_name}"}
+            
+            cursor.execute(
+                f"UPDATE the_mall SET StallNumber = %s, StreetName = %s, RowVersion = {NEXT_ROW_VERSION} WHERE StallNumber = %s AND StreetName = %s",
+                (new_stall_number, new_street_name, stall_number, street_name)
+            )
+            record_tombstone(cursor, "the_mall", stall_number, street_name)
+            
+            # With database/stall_move_cascade.sql applied, ON UPDATE CASCADE has already moved these rows
+            # and the updates below match nothing. Without it they do the fan-out in the same transaction
+            for child_table in ("the_mall_reviews", "the_mall_review_stats"):
+                cursor.execute(
+                    f"UPDATE {child_table} SET StallNumber = %s, StreetName = %s WHERE StallNumber = %s AND StreetName = %s",
+                    (new_stall_number, new_street_name, stall_number, street_name)
+                )
+            
+            # Log the move under both keys so either stall's history shows it
+            old_key = {"StallNumber": stall_number, "StreetName": street_name}
+            new_key = {"StallNumber": new_stall_number, "StreetName": new_street_name}
+            record_changes(cursor, [
+                audit_row("the_mall", stall_number, street_name, "move_out", changed_by, before=old_key, after=new_key),
+                audit_row("the_mall", new_stall_number, new_street_name, "move_in", changed_by, before=old_key, after=new_key),
+            ])
+            self.bot.invalidation.broadcast(cursor, "stall", "the_mall", stall_number, street_name)
+            self.bot.invalidation.broadcast(cursor, "stall", "the_mall", new_stall_number, new_street_name)
+            
+            conn.commit()
+            cursor.close()
+            conn.close()
+            
+            self.bot.db_pool.record_write(changed_by)
+            columns = ["StallNumber", "StreetName", "IGN", "StallName", "ItemsSold"]
+            stall_data = dict(zip(columns, existing))
+            stall_data.update({"StallNumber": new_stall_number, "StreetName": new_street_name})
+            return {"success": True, "stall": stall_data}
+            
+        except mariadb.Error as e:
+            print(f"Error moving stall {stall_number} on {street_name}: {e}")
+            if conn:
+                conn.close()
+            return {"success": False, "error": f"Database error: {str(e)}"}
+
+    async def get_stall_history(self, table_name: str, stall_number, street_name: str, cursor=None) -> dict:
+        return await asyncio.to_thread(self._query_stall_history, table_name, stall_number, street_name, cursor)
+
+    def _query_stall_history(self, table_name: str, stall_number, street_name: str, cursor=None) -> dict:
+        """Read one page of a stall's audit log, newest first, starting after the (ChangedAt, AuditID) cursor"""
+        conn = self.get_db_connection(read_only=True)
+        if not conn:
+            return {"error": "Database connection failed"}
+        
+        try:
+            db_cursor = conn.cursor()
+            
+            # Keyset pagination over idx_audit_stall, so older pages cost the same as the first
+            query = """
+            SELECT AuditID, Action, ChangedBy, BeforeData, AfterData, ChangedAt
+            FROM stall_audit_log
+            WHERE TableName = %s AND StallNumber = %s AND StreetName = %s
+            """
+            params = [table_name, stall_number, street_name or ""]
+            if cursor:
+                query += " AND (ChangedAt < %s OR (ChangedAt = %s AND AuditID < %s))"
+                params += [cursor[0], cursor[0], cursor[1]]
+            query += " ORDER BY ChangedAt DESC, AuditID DESC LIMIT %s"
+            params.append(HISTORY_PAGE_SIZE + 1)
+            
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+            
+            db_cursor.close()
+            conn.close()
+            
+            columns = ["AuditID", "Action", "ChangedBy", "BeforeData", "AfterData", "ChangedAt"]
+            entries = [dict(zip(columns, row)) for row in rows[:HISTORY_PAGE_SIZE]]
+            has_more = len(rows) > HISTORY_PAGE_SIZE
+            return {"entries": entries, "has_more": has_more}
+            
+        except mariadb.Error as e:
+            print(f"Error querying history for {table_name} #{stall_number}: {e}")
+            if conn:
+                conn.close()
+            return {"error": f"Database query failed: {str(e)}"}
+
+    async def build_history_page(self, table_name: str, stall_number, street_name: str, cursor=None):
+        """Render one page of stall history, with an Older button when there is more"""
+        result = await self.get_stall_history(table_name, stall_number, street_name, cursor)
+        
+        if "error" in result:
+            return discord.Embed(title="Error", description=result["error"], color=0xe74c3c), discord.utils.MISSING
+        
+        title = f"📜 History: {HISTORY_TABLES[table_name]} #{format_stall_number(stall_number)}"
+        if street_name:
+            title += f" on {street_name}"
+        embed = discord.Embed(title=title, color=0x3498db)
+        
+        if not result["entries"]:
+            embed.description = "No older changes recorded." if cursor else "No changes recorded for this stall."
+        
+        for entry in result["entries"]:
+            who = f"<@{entry['ChangedBy']}>" if entry["ChangedBy"] else "Unknown"
+            summary = describe_change(entry["BeforeData"], entry["AfterData"], entry["Action"])
+            value = f"By {who}\n{summary}"
+            embed.add_field(
+                name=f"{entry['Action']} • <t:{int(entry['ChangedAt'].timestamp())}:f>"[:256],
+                value=value[:1021] + ("..." if len(value) > 1021 else ""),
+                inline=False
+            )
+        embed.set_footer(text="Furryville Index Database")
+        
+        if not result["has_more"]:
+            return embed, discord.utils.MISSING
+        
+        last = result["entries"][-1]
+        view = discord.ui.View(timeout=None)
+        view.add_item(HistoryOlderButton(table_name, stall_number, street_name or "", last["ChangedAt"], last["AuditID"]))
+        return embed, view
+
+    def create_edit_success_embed(self, table_name: str, stall_data: dict, updated_fields: dict) -> discord.Embed:
+        """Create a success embed for the edited stall"""
+        title = "✅ Warp Hall Stall Updated Successfully!" if table_name == "warp_hall" else "✅ The Mall Stall Updated Successfully!"
+        wide_columns = ("StallName", "ItemsSold") if table_name == "the_mall" else ()
+        embed = build_stall_embed(table_name, stall_data, title, 0x00ff00, wide_columns)
         
         # Add information about what was updated
         updated_field_names = []
@@ -351,7 +658,19 @@ class EntryEdit(commands.Cog):
             inline=False
         )
         
-        embed.set_footer(text="Furryville Index Database")
+        return embed
+
+    def create_edit_conflict_embed(self, table_name: str, result: dict, attempted: dict) -> discord.Embed:
+        """Create a warning embed showing the stall as it is now next to the edit that was rejected"""
+        wide_columns = ("StallName", "ItemsSold") if table_name == "the_mall" else ()
+        embed = build_stall_embed(table_name, result["latest"], "⚠️ Edit Conflict", 0xffaa00, wide_columns)
+        embed.description = f"{result['error']} The stall currently looks like this."
+        labels = {column: name for name, column, _ in STALL_FIELDS[table_name]}
+        embed.add_field(
+            name="Your Changes (not saved)",
+            value="\n".join(f"**{labels.get(field, field)}:** {value}" for field, value in attempted.items())[:1024],
+            inline=False
+        )
         return embed
 
     @app_commands.command(name="stalledit", description="Edit an existing stall entry")
@@ -363,14 +682,15 @@ class EntryEdit(commands.Cog):
         app_commands.Choice(name="Warp Hall", value="warp_hall"),
         app_commands.Choice(name="The Mall", value="the_mall")
     ])
+    @rate_limited("write")
     @has_bot_permissions()
-    async def stalledit(self, interaction: discord.Interaction, table: app_commands.Choice[str], stall_number: float):
+    async def stalledit(self, interaction: discord.Interaction, table: app_commands.Choice[str], stall_number: app_commands.Transform[Decimal, StallNumberTransformer]):
         """Edit an existing stall entry"""
         
         # Validate stall number based on table type
         if table.value == "warp_hall":
             # Warp Hall requires integers
-            if not isinstance(stall_number, int) and not stall_number.is_integer():
+            if not is_whole_number(stall_number):
                 embed = discord.Embed(
                     title="Invalid Stall Number",
                     description="Warp Hall stall numbers must be whole numbers (integers).",
@@ -389,6 +709,30 @@ class EntryEdit(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
+        # With the stall in the directory, the form can be the immediate response: no defer,
+        # no query and no extra button click
+        directory = self.bot.stall_directory
+        if table.value == "warp_hall":
+            stall_data = directory.get("warp_hall", stall_number)
+            if stall_data is not None:
+                await interaction.response.send_modal(StallEditModal("warp_hall", stall_data, self))
+                return
+        else:
+            streets = directory.streets(stall_number)
+            stall_data = directory.get("the_mall", stall_number, streets[0]) if len(streets) == 1 else None
+            if stall_data is not None:
+                await interaction.response.send_modal(StallEditModal("the_mall", stall_data, self))
+                return
+            if streets:
+                # On several streets: the dropdown is still needed, but the existence check isn't
+                embed = discord.Embed(
+                    title="Select Street Name",
+                    description=f"Please select which street the stall #{format_stall_number(stall_number)} is located on:",
+                    color=0x3498db
+                )
+                await interaction.response.send_message(embed=embed, view=StreetSelectionView(stall_number), ephemeral=True)
+                return
+        
         if table.value == "warp_hall":
             # For Warp Hall, directly get data and show edit modal
             # We need to defer here because we're doing database operations
@@ -405,27 +749,17 @@ class EntryEdit(commands.Cog):
                 await interaction.followup.send(embed=embed, ephemeral=True)
                 return
             
-            # Create a button that will open the modal
-            class EditButton(discord.ui.View):
-                def __init__(self, stall_data, cog):
-                    super().__init__(timeout=60)
-                    self.stall_data = stall_data
-                    self.cog = cog
-                
-                @discord.ui.button(label="Open Edit Form", style=discord.ButtonStyle.primary, emoji="✏️")
-                async def open_edit_modal(self, button_interaction: discord.Interaction, button: discord.ui.Button):
-                    modal = StallEditModal("warp_hall", self.stall_data, self.cog)
-                    await button_interaction.response.send_modal(modal)
-            
             embed = discord.Embed(
                 title="Warp Hall Stall Found",
-                description=f"Stall #{stall_number} found. Click the button below to open the edit form.",
+                description=f"Stall #{format_stall_number(stall_number)} found. Click the button below to open the edit form.",
                 color=0x3498db
             )
             embed.add_field(name="Current Owner IGN", value=stall_data["IGN"], inline=True)
             embed.add_field(name="Current Stall Name", value=stall_data["StallName"], inline=True)
             
-            view = EditButton(stall_data, self)
+            # Stateless button that will open the modal
+            view = discord.ui.View(timeout=None)
+            view.add_item(EditFormButton(stall_number))
             await interaction.followup.send(embed=embed, view=view, ephemeral=True)
             
         else:  # the_mall
@@ -444,14 +778,117 @@ class EntryEdit(commands.Cog):
                 return
             
             # Show street selection dropdown
-            view = StreetSelectionView(stall_number, self)
+            view = StreetSelectionView(stall_number)
             embed = discord.Embed(
                 title="Select Street Name",
-                description=f"Please select which street the stall #{stall_number} is located on:",
+                description=f"Please select which street the stall #{format_stall_number(stall_number)} is located on:",
                 color=0x3498db
             )
             await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
+    @app_commands.command(name="stallmove", description="Renumber a The Mall stall or move it to another street")
+    @app_commands.describe(
+        stall_number="The stall's current number",
+        street_name="The stall's current street",
+        new_stall_number="The new stall number",
+        new_street_name="The new street (leave empty to keep the current street)"
+    )
+    @rate_limited("write")
+    @has_bot_permissions()
+    async def stallmove(
+        self,
+        interaction: discord.Interaction,
+        stall_number: app_commands.Transform[Decimal, StallNumberTransformer],
+        street_name: app_commands.Transform[str, StreetNameTransformer],
+        new_stall_number: app_commands.Transform[Decimal, StallNumberTransformer],
+        new_street_name: Optional[app_commands.Transform[str, StreetNameTransformer]] = None
+    ):
+        """Change a stall's number and/or street, carrying its reviews along"""
+        new_street_name = new_street_name or street_name
+        
+        if street_name not in VALID_STREETS or new_street_name not in VALID_STREETS:
+            embed = discord.Embed(
+                title="Invalid Street Name",
+                description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        if stall_number <= 0 or new_stall_number <= 0:
+            embed = discord.Embed(
+                title="Invalid Stall Number",
+                description="Stall number must be a positive number.",
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        if (stall_number, street_name) == (new_stall_number, new_street_name):
+            embed = discord.Embed(
+                title="No Changes Made",
+                description="The new stall number and street are the same as the current ones.",
+                color=0xffaa00
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.defer()
+        result = await self.move_stall_entry(stall_number, street_name, new_stall_number, new_street_name, interaction.user.id)
+        
+        if not result["success"]:
+            embed = discord.Embed(
+                title="Error Moving Stall",
+                description=result["error"],
+                color=0xe74c3c
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+        
+        embed = build_stall_embed("the_mall", result["stall"], "✅ The Mall Stall Moved Successfully!", 0x00ff00, ("StallName", "ItemsSold"))
+        embed.add_field(
+            name="Moved From",
+            value=f"#{format_stall_number(stall_number)} on {street_name}",
+            inline=False
+        )
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="stallhistory", description="Show the change history of a stall (mod only)")
+    @app_commands.describe(
+        table="Which records to show history for",
+        stall_number="The stall number",
+        street_name="The street name (required for The Mall)"
+    )
+    @app_commands.choices(table=[
+        app_commands.Choice(name="Warp Hall", value="warp_hall"),
+        app_commands.Choice(name="The Mall", value="the_mall"),
+        app_commands.Choice(name="The Mall Reviews", value="the_mall_reviews")
+    ])
+    @rate_limited("lookup")
+    @has_bot_permissions()
+    async def stallhistory(
+        self,
+        interaction: discord.Interaction,
+        table: app_commands.Choice[str],
+        stall_number: app_commands.Transform[Decimal, StallNumberTransformer],
+        street_name: Optional[app_commands.Transform[str, StreetNameTransformer]] = None
+    ):
+        """Page through a stall's audit log, newest first"""
+        if table.value == "warp_hall":
+            street_name = None
+        elif street_name not in VALID_STREETS:
+            embed = discord.Embed(
+                title="Invalid Street Name",
+                description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        await interaction.response.defer(ephemeral=True)
+        embed, view = await self.build_history_page(table.value, stall_number, street_name)
+        await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+
 async def setup(bot):
     """Setup function for the cog"""
     await bot.add_cog(EntryEdit(bot))
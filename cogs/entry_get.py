@@ -1,75 +1,50 @@
 # Cog to handle entry retrieval
 
 import asyncio
-import os
 import time
+from decimal import Decimal
+from typing import Optional
 import discord
 from discord import app_commands
 from discord.ext import commands
-from dotenv import load_dotenv
 import pymysql as mariadb
 
-def has_bot_permissions():
-    """Check if user has the required role or is the bot owner"""
-    async def predicate(interaction: discord.Interaction) -> bool:
-        # Get environment variables
-        postman_id = int(os.getenv('POSTMAN_ID'))
-        bot_role_id = int(os.getenv('BOTROLE_ID'))
-        
-        # Allow POSTMAN_ID user always
-        if interaction.user.id == postman_id:
-            return True
-        
-        # Check if user has the required role
-        if hasattr(interaction.user, 'roles'):
-            for role in interaction.user.roles:
-                if role.id == bot_role_id:
-                    return True
-        
-        # If no permissions, send error message
-        embed = discord.Embed(
-            title="❌ Permission Denied",
-            description="You don't have permission to use this bot's commands.",
-            color=0xe74c3c
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-        return False
-    
-    return app_commands.check(predicate)
+from utils.fastpath import send, within_budget
+from utils.permissions import has_bot_permissions
+from utils.ratelimit import rate_limited
+from utils.snapshot import mark_stale
+from utils.stall_card import FOOTER, format_stall_number
+from utils.stall_number import StallNumberTransformer, is_whole_number, parse_stall_number, parse_stall_spec
+from utils.streets import VALID_STREETS, StreetNameTransformer
 
-class StreetSelectionView(discord.ui.View):
-    """View for selecting street name when viewing The Mall stalls"""
-    
-    VALID_STREETS = [
-        "Wall Street",
-        "Artist Alley", 
-        "Woke Ave",
-        "Five",
-        "Poland Street"
-    ]
+class StreetSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"fvi:view:mall:(?P<stall>[0-9.]+)"):
+    """Persistent street dropdown for viewing The Mall stalls. The stall number lives in the custom_id"""
     
-    def __init__(self, stall_number, cog, timeout=300):
-        super().__init__(timeout=timeout)
+    def __init__(self, stall_number):
         self.stall_number = stall_number
-        self.cog = cog
+        stall_display = format_stall_number(stall_number)
         
         # Create dropdown with street options
-        select = discord.ui.Select(
+        super().__init__(discord.ui.Select(
+            custom_id=f"fvi:view:mall:{stall_display}",
             placeholder="Select the street name for this stall...",
             options=[
-                discord.SelectOption(label=street, value=street, description=f"View stall #{stall_number} on {street}")
-                for street in self.VALID_STREETS
+                discord.SelectOption(label=street, value=street, description=f"View stall #{stall_display} on {street}")
+                for street in VALID_STREETS
             ]
-        )
-        select.callback = self.street_selected
-        self.add_item(select)
+        ))
     
-    async def street_selected(self, interaction: discord.Interaction):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(parse_stall_number(match["stall"]))
+    
+    async def callback(self, interaction: discord.Interaction):
         """Handle street selection and show stall data"""
-        street_name = interaction.data['values'][0]
+        street_name = self.item.values[0]
+        cog = interaction.client.get_cog("EntryGet")
         
         # Get stall data with specific street
-        stall_data = await self.cog.get_stall_data_with_street("the_mall", self.stall_number, street_name)
+        stall_data = await cog.get_stall_data_with_street("the_mall", self.stall_number, street_name, interaction.user.id)
         
         if "error" in stall_data:
             embed = discord.Embed(
@@ -81,9 +56,9 @@ class StreetSelectionView(discord.ui.View):
             return
         
         # Create and send embed
-        embed = self.cog.create_stall_embed("the_mall", stall_data)
+        embed = cog.create_stall_embed("the_mall", stall_data)
         if embed:
-            await interaction.response.send_message(embed=embed)
+            await interaction.response.send_message(embed=mark_stale(embed, stall_data))
         else:
             embed = discord.Embed(
                 title="Error",
@@ -92,88 +67,184 @@ class StreetSelectionView(discord.ui.View):
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
+class StreetSelectionView(discord.ui.View):
+    """View for selecting street name when viewing The Mall stalls. Holds no state, so it never times out"""
+    
+    def __init__(self, stall_number):
+        super().__init__(timeout=None)
+        self.add_item(StreetSelect(stall_number))
+
+LIST_PAGE_SIZE = 15
+BATCH_LIMIT = 50  # Most stalls one /stallbatch answer will show
+
+LIST_TITLES = {
+    "warp_hall": "Warp Hall Stalls",
+    "the_mall": "The Mall Stalls",
+}
+
+class StallListButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"fvi:list:(?P<table>warp_hall|the_mall):(?P<street>[A-Za-z ]*):(?P<page>[0-9]+):(?P<after_street>[A-Za-z ]*):(?P<after>[0-9.]*):(?P<user>[0-9]+)"
+):
+    """Persistent page button for /stalllist. The page's keyset cursor and the user who ran the command live in the custom_id"""
+    
+    def __init__(self, table_name: str, street_name: str, page: int, user_id: int, cursor=None):
+        self.table_name = table_name
+        self.street_name = street_name or None
+        self.page = page
+        self.user_id = user_id
+        self.cursor = cursor  # (StreetName, StallNumber) of the last stall on the previous page, None for page 1
+        after_street, after = cursor if cursor else ("", "")
+        super().__init__(discord.ui.Button(
+            label="First" if page == 1 else "Next",
+            style=discord.ButtonStyle.secondary,
+            emoji="⏮️" if page == 1 else "▶️",
+            custom_id=f"fvi:list:{table_name}:{street_name or ''}:{page}:{after_street}:{format_stall_number(after) if after != '' else ''}:{user_id}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        cursor = (match["after_street"], parse_stall_number(match["after"])) if match["after"] else None
+        return cls(match["table"], match["street"], int(match["page"]), int(match["user"]), cursor)
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("Run `/stalllist` yourself to page through stalls.", ephemeral=True)
+            return False
+        return True
+    
+    async def callback(self, interaction: discord.Interaction):
+        """Swap the list message to this button's page, usually already prefetched"""
+        cog = interaction.client.get_cog("EntryGet")
+        result = await within_budget(
+            interaction,
+            cog.get_stall_page(self.table_name, self.street_name, self.cursor, interaction.user.id),
+            cog.config.fast_response_budget, cog.bot.response_stats, "stalllist"
+        )
+        embed, view = cog.build_stall_list(self.table_name, self.street_name, self.page, self.cursor, result, interaction.user.id)
+        
+        if interaction.response.is_done():
+            await interaction.edit_original_response(embed=embed, view=view)
+        else:
+            await interaction.response.edit_message(embed=embed, view=view)
+
+def format_stall_line(table_name: str, stall: dict, show_street: bool = True) -> str:
+    """One compact line per stall for list embeds"""
+    line = f"`#{format_stall_number(stall['StallNumber'])}`"
+    if table_name == "the_mall" and show_street:
+        line += f" {stall['StreetName']} ·"
+    return line + f" **{str(stall['StallName'])[:40]}** · {str(stall['IGN'])[:32]}"
+
+class StallBatchView(discord.ui.View):
+    """Pages through an already-fetched /stallbatch result. Only the user who ran the command can flip pages"""
+    
+    def __init__(self, pages: list, user_id: int):
+        super().__init__(timeout=180)
+        self.pages = pages
+        self.user_id = user_id
+        self.index = 0
+        self.message = None  # Set once sent, so the buttons can be disabled when the pages expire
+        self.update_buttons()
+    
+    def update_buttons(self):
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.index == len(self.pages) - 1
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("Run `/stallbatch` yourself to page through stalls.", ephemeral=True)
+            return False
+        return True
+    
+    async def on_timeout(self):
+        # The pages only live in this view, so don't leave buttons that would fail once it's gone
+        self.previous_page.disabled = True
+        self.next_page.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+    
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.index -= 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.index], view=self)
+    
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.index += 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.index], view=self)
+
 class EntryGet(commands.Cog):
     """Cog for retrieving stall entries from the database"""
     
     def __init__(self, bot):
         self.bot = bot
+        self.config = bot.config
+
+    async def cog_load(self):
+        # Dynamic items route clicks by custom_id, so buttons keep working across restarts and reloads
+        self.bot.add_dynamic_items(StreetSelect, StallListButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(StreetSelect, StallListButton)
         
-    def get_db_connection(self):
-        """Get database connection"""
+    def get_db_connection(self, read_only: bool = False, replica: bool = False):
+        """Get a database connection from the bot's shared pool"""
         try:
-            conn = mariadb.connect(
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                host="furryville-index.db",
-                database="furryville"
-            )
-            return conn
+            return self.bot.db_pool.get_connection(read_only, replica)
         except mariadb.Error as e:
             print(f"Error connecting to MariaDB: {e}")
             return None
 
     def create_stall_embed(self, table_name: str, stall_data: dict) -> discord.Embed:
         """Create an embed for stall information"""
-        # Format stall number to display as integer if it's a whole number
-        stall_number = stall_data.get('StallNumber', 'Unknown')
-        if isinstance(stall_number, float) and stall_number.is_integer():
-            stall_number_display = str(int(stall_number))
-        else:
-            stall_number_display = str(stall_number)
-        
-        # Define table-specific configurations for easy modification
-        table_configs = {
-            "warp_hall": {
-                "title": "Warp Hall Stall",
-                "color": 0xffd966,  # Yellow
-                "fields": [
-                    ("Stall Number", stall_number_display),
-                    ("Owner IGN", "IGN"),
-                    ("Stall Name", "StallName")
-                ]
-            },
-            "the_mall": {
-                "title": "The Mall Stall",
-                "color": 0xffd966,  # Yellow
-                "fields": [
-                    ("Stall Number", stall_number_display),
-                    ("Street Name", "StreetName"),
-                    ("Owner IGN", "IGN"),
-                    ("Stall Name", "StallName"),
-                    ("Items Sold", "ItemsSold")
-                ]
-            }
-        }
-        
-        config = table_configs.get(table_name)
-        if not config:
-            return None
-            
-        embed = discord.Embed(
-            title=f"{config['title']} #{stall_number_display}",
-            color=config["color"]
-        )
-        
-        # Add fields dynamically based on configuration
-        for field_name, db_column in config["fields"]:
-            if field_name == "Stall Number":
-                # Use the already formatted stall number
-                value = db_column  # This is already the formatted display value
-            else:
-                value = stall_data.get(db_column, "Not Available")
-            embed.add_field(name=field_name, value=value, inline=True)
-            
-        embed.set_footer(text="Furryville Index Database")
-        return embed
+        return self.bot.stall_cards.render(table_name, stall_data)
 
-    async def get_stall_data(self, table_name: str, stall_number) -> dict:
+    async def get_stall_data(self, table_name: str, stall_number, user_id: int = None) -> dict:
         """Get stall data from the specified table (Warp Hall only)"""
         if table_name != "warp_hall":
             return {"error": "This method only supports Warp Hall. Use get_stall_data_with_street for The Mall."}
-            
-        conn = self.get_db_connection()
+
+        # Concurrent views of the same stall share one query, run off the event loop. Readers pinned to
+        # the primary after their own write get their own flight so they never share a replica result.
+        # The stall directory trails the database like a replica, so skip it for users who just wrote
+        replica = self.bot.db_pool.replica_ok(user_id)
+        cached = None if self.bot.db_pool.recently_wrote(user_id) else self.bot.stall_directory.get("warp_hall", stall_number)
+        if cached is not None:
+            return cached
+        return await self.bot.single_flight.do(
+            ("stall", "warp_hall", stall_number, replica), asyncio.to_thread, self._query_warp_hall_stall, stall_number, replica
+        )
+
+    async def get_stall_data_with_street(self, table_name: str, stall_number, street_name: str, user_id: int = None) -> dict:
+        """Get stall data from The Mall with specific street name"""
+        replica = self.bot.db_pool.replica_ok(user_id)
+        cached = None if self.bot.db_pool.recently_wrote(user_id) else self.bot.stall_directory.get("the_mall", stall_number, street_name)
+        if cached is not None:
+            return cached
+        return await self.bot.single_flight.do(
+            ("stall", "the_mall", stall_number, street_name, replica), asyncio.to_thread, self._query_mall_stall, stall_number, street_name, replica
+        )
+
+    async def check_mall_stall_exists(self, stall_number, user_id: int = None) -> dict:
+        """Check if a stall number exists in The Mall (any street)"""
+        replica = self.bot.db_pool.replica_ok(user_id)
+        streets = [] if self.bot.db_pool.recently_wrote(user_id) else self.bot.stall_directory.streets(stall_number)
+        if streets:
+            return {"exists": True, "count": len(streets)}
+        return await self.bot.single_flight.do(
+            ("mall_count", stall_number, replica), asyncio.to_thread, self._query_mall_stall_count, stall_number, replica
+        )
+
+    def _query_warp_hall_stall(self, stall_number, replica: bool = False) -> dict:
+        """Query a Warp Hall stall (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
         if not conn:
-            return {"error": "Database connection failed"}
+            return self.bot.snapshot.warp_hall_stall(stall_number)
         
         try:
             cursor = conn.cursor()
@@ -186,7 +257,7 @@ class EntryGet(commands.Cog):
             conn.close()
             
             if not result:
-                return {"error": f"No stall found with number {stall_number} in Warp Hall"}
+                return {"error": f"No stall found with number {format_stall_number(stall_number)} in Warp Hall"}
             
             columns = ["StallNumber", "IGN", "StallName"]
             return dict(zip(columns, result))
@@ -197,11 +268,11 @@ class EntryGet(commands.Cog):
                 conn.close()
             return {"error": f"Database query failed: {str(e)}"}
 
-    async def get_stall_data_with_street(self, table_name: str, stall_number, street_name: str) -> dict:
-        """Get stall data from The Mall with specific street name"""
-        conn = self.get_db_connection()
+    def _query_mall_stall(self, stall_number, street_name: str, replica: bool = False) -> dict:
+        """Query a The Mall stall by number and street (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
         if not conn:
-            return {"error": "Database connection failed"}
+            return self.bot.snapshot.mall_stall(stall_number, street_name)
         
         try:
             cursor = conn.cursor()
@@ -214,7 +285,7 @@ class EntryGet(commands.Cog):
             conn.close()
             
             if not result:
-                return {"error": f"No stall found with number {stall_number} on {street_name}"}
+                return {"error": f"No stall found with number {format_stall_number(stall_number)} on {street_name}"}
             
             columns = ["StallNumber", "StreetName", "IGN", "StallName", "ItemsSold"]
             return dict(zip(columns, result))
@@ -225,11 +296,11 @@ class EntryGet(commands.Cog):
                 conn.close()
             return {"error": f"Database query failed: {str(e)}"}
 
-    async def check_mall_stall_exists(self, stall_number) -> dict:
-        """Check if a stall number exists in The Mall (any street)"""
-        conn = self.get_db_connection()
+    def _query_mall_stall_count(self, stall_number, replica: bool = False) -> dict:
+        """Count The Mall stalls with this number across streets (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
         if not conn:
-            return {"error": "Database connection failed"}
+            return self.bot.snapshot.mall_stall_count(stall_number)
         
         try:
             cursor = conn.cursor()
@@ -242,7 +313,7 @@ class EntryGet(commands.Cog):
             conn.close()
             
             if count == 0:
-                return {"error": f"No stall found with number {stall_number} in The Mall"}
+                return {"error": f"No stall found with number {format_stall_number(stall_number)} in The Mall"}
             
             return {"exists": True, "count": count}
             
@@ -252,6 +323,297 @@ class EntryGet(commands.Cog):
                 conn.close()
             return {"error": f"Database query failed: {str(e)}"}
 
+    def _stall_page_key(self, table_name: str, street_name: str, cursor, user_id: int = None) -> tuple:
+        # Pages read from a replica and from the primary are cached apart, like single-flight keys
+        return (table_name, street_name, cursor, self.bot.db_pool.replica_ok(user_id))
+
+    async def get_stall_page(self, table_name: str, street_name: str, cursor=None, user_id: int = None) -> dict:
+        """One page of stalls after the cursor, from the page cache when it was prefetched"""
+        key = self._stall_page_key(table_name, street_name, cursor, user_id)
+        result = await self.bot.stall_pages.get(key, asyncio.to_thread, self._query_stall_page, *key)
+        if "error" in result:
+            self.bot.stall_pages.discard(key)
+        return result
+
+    def prefetch_stall_page(self, table_name: str, street_name: str, cursor, user_id: int = None):
+        """Start loading the following page in the background so its button answers instantly"""
+        key = self._stall_page_key(table_name, street_name, cursor, user_id)
+        self.bot.stall_pages.prefetch(key, asyncio.to_thread, self._query_stall_page, *key)
+
+    def _stall_page_result(self, stalls: list) -> dict:
+        """Cut a LIST_PAGE_SIZE + 1 row read down to one page and the cursor for the next"""
+        page = stalls[:LIST_PAGE_SIZE]
+        has_more = len(stalls) > LIST_PAGE_SIZE
+        next_cursor = None
+        if has_more:
+            last = page[-1]
+            next_cursor = (last.get("StreetName", ""), parse_stall_number(last["StallNumber"]))
+        return {"stalls": page, "has_more": has_more, "next": next_cursor}
+
+    def _query_stall_page(self, table_name: str, street_name: str, cursor=None, replica: bool = False) -> dict:
+        """Read one page of stalls in (StreetName, StallNumber) order after the cursor (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
+        if not conn:
+            result = self.bot.snapshot.stall_page(table_name, street_name, cursor, LIST_PAGE_SIZE + 1)
+            if "error" in result:
+                return result
+            return {**self._stall_page_result(result["stalls"]), "stale_as_of": result["stale_as_of"]}
+        
+        try:
+            db_cursor = conn.cursor()
+            
+            # Keyset pagination: seek past the last stall shown instead of OFFSET, so every page
+            # costs one index range scan (PRIMARY for warp_hall, idx_street_stall for the_mall)
+            conditions = []
+            params = []
+            if table_name == "warp_hall":
+                columns = ["StallNumber", "IGN", "StallName"]
+                order = "StallNumber"
+                if cursor:
+                    conditions.append("StallNumber > %s")
+                    params.append(cursor[1])
+            else:  # the_mall
+                columns = ["StallNumber", "StreetName", "IGN", "StallName"]
+                order = "StreetName, StallNumber"
+                if street_name:
+                    conditions.append("StreetName = %s")
+                    params.append(street_name)
+                if cursor:
+                    conditions.append("(StreetName > %s OR (StreetName = %s AND StallNumber > %s))")
+                    params += [cursor[0], cursor[0], cursor[1]]
+            
+            query = f"SELECT {', '.join(columns)} FROM {table_name}"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += f" ORDER BY {order} LIMIT %s"
+            params.append(LIST_PAGE_SIZE + 1)
+            
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+            
+            db_cursor.close()
+            conn.close()
+            
+            return self._stall_page_result([dict(zip(columns, row)) for row in rows])
+            
+        except mariadb.Error as e:
+            print(f"Error listing {table_name}: {e}")
+            if conn:
+                conn.close()
+            return {"error": f"Database query failed: {str(e)}"}
+
+    def build_stall_list(self, table_name: str, street_name: str, page: int, cursor, result: dict, user_id: int):
+        """Render one page of /stalllist as a compact embed with First/Next buttons, and prefetch the next page"""
+        view = discord.ui.View(timeout=None)
+        
+        if "error" in result:
+            embed = discord.Embed(title="Error", description=result["error"], color=0xe74c3c)
+            if cursor:
+                # Keep a way back so a transient failure doesn't strand the message
+                view.add_item(StallListButton(table_name, street_name, 1, user_id))
+            return embed, view
+        
+        title = f"📜 {LIST_TITLES[table_name]}"
+        if street_name:
+            title += f" on {street_name}"
+        embed = discord.Embed(title=title, color=0x3498db)
+        
+        lines = [format_stall_line(table_name, stall, show_street=not street_name) for stall in result["stalls"]]
+        embed.description = "\n".join(lines) if lines else ("No more stalls." if cursor else "No stalls found.")
+        embed.set_footer(text=f"Page {page} • {FOOTER}")
+        mark_stale(embed, result)
+        
+        if cursor:
+            view.add_item(StallListButton(table_name, street_name, 1, user_id))
+        if result["has_more"]:
+            view.add_item(StallListButton(table_name, street_name, page + 1, user_id, result["next"]))
+            self.prefetch_stall_page(table_name, street_name, result["next"], user_id)
+        return embed, view
+
+    async def get_stall_batch(self, table_name: str, numbers: list, ranges: list, street_name: str = None, user_id: int = None) -> dict:
+        """Every stall matching the numbers and ranges, from the stall directory or one query"""
+        if not self.bot.db_pool.recently_wrote(user_id):
+            cached = self.bot.stall_directory.search(table_name, numbers, ranges, street_name)
+            if cached is not None:
+                return {"stalls": cached[:BATCH_LIMIT], "truncated": len(cached) > BATCH_LIMIT}
+        
+        replica = self.bot.db_pool.replica_ok(user_id)
+        return await self.bot.single_flight.do(
+            ("stall_batch", table_name, tuple(numbers), tuple(ranges), street_name, replica),
+            asyncio.to_thread, self._query_stall_batch, table_name, numbers, ranges, street_name, replica
+        )
+
+    def _query_stall_batch(self, table_name: str, numbers: list, ranges: list, street_name: str = None, replica: bool = False) -> dict:
+        """Fetch all requested stalls with a single IN/BETWEEN query (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
+        if not conn:
+            result = self.bot.snapshot.stall_batch(table_name, numbers, ranges, street_name, BATCH_LIMIT + 1)
+            if "error" in result:
+                return result
+            stalls = result["stalls"]
+            return {"stalls": stalls[:BATCH_LIMIT], "truncated": len(stalls) > BATCH_LIMIT, "stale_as_of": result["stale_as_of"]}
+        
+        try:
+            cursor = conn.cursor()
+            
+            conditions = []
+            params = []
+            if numbers:
+                conditions.append(f"StallNumber IN ({', '.join(['%s'] * len(numbers))})")
+                params += numbers
+            for low, high in ranges:
+                conditions.append("StallNumber BETWEEN %s AND %s")
+                params += [low, high]
+            
+            if table_name == "warp_hall":
+                columns = ["StallNumber", "IGN", "StallName"]
+                order = "StallNumber"
+            else:  # the_mall
+                columns = ["StallNumber", "StreetName", "IGN", "StallName"]
+                order = "StallNumber, StreetName"
+            
+            query = f"SELECT {', '.join(columns)} FROM {table_name} WHERE ({' OR '.join(conditions)})"
+            if street_name:
+                query += " AND StreetName = %s"
+                params.append(street_name)
+            # One row past the cap tells us whether the answer was cut short
+            query += f" ORDER BY {order} LIMIT %s"
+            params.append(BATCH_LIMIT + 1)
+            
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            
+            cursor.close()
+            conn.close()
+            
+            return {"stalls": [dict(zip(columns, row)) for row in rows[:BATCH_LIMIT]], "truncated": len(rows) > BATCH_LIMIT}
+            
+        except mariadb.Error as e:
+            print(f"Error batch querying {table_name}: {e}")
+            if conn:
+                conn.close()
+            return {"error": f"Database query failed: {str(e)}"}
+
+    def build_stall_batch_pages(self, table_name: str, street_name: str, numbers: list, result: dict) -> list:
+        """Split a /stallbatch result into embeds of LIST_PAGE_SIZE stalls each"""
+        stalls = result["stalls"]
+        title = f"🔎 {LIST_TITLES[table_name]}"
+        if street_name:
+            title += f" on {street_name}"
+        
+        found = {parse_stall_number(stall["StallNumber"]) for stall in stalls}
+        missing = [number for number in numbers if number not in found]
+        chunks = [stalls[start:start + LIST_PAGE_SIZE] for start in range(0, len(stalls), LIST_PAGE_SIZE)] or [[]]
+        
+        pages = []
+        for page, chunk in enumerate(chunks, start=1):
+            embed = discord.Embed(title=title, color=0x3498db)
+            lines = [format_stall_line(table_name, stall, show_street=not street_name) for stall in chunk]
+            embed.description = "\n".join(lines) if lines else "No matching stalls found."
+            # Only complete results can say which listed numbers don't exist
+            if missing and not result["truncated"]:
+                embed.add_field(name="Not Found", value=", ".join(format_stall_number(number) for number in missing)[:1024], inline=False)
+            if result["truncated"]:
+                embed.add_field(name="⚠️ Too Many Stalls", value=f"Showing the first {BATCH_LIMIT}. Narrow the range to see the rest.", inline=False)
+            embed.set_footer(text=f"Page {page}/{len(chunks)} • {FOOTER}")
+            pages.append(mark_stale(embed, result))
+        return pages
+
+    @app_commands.command(name="stallbatch", description="View several stalls at once, e.g. 10-25 or 3, 7, 9.5")
+    @app_commands.describe(
+        table="The location to search (warp or mall)",
+        stalls="Stall numbers and/or ranges, separated by commas (e.g. 10-25 or 3, 7, 9.5)",
+        street="Only show stalls on this street (The Mall only)"
+    )
+    @app_commands.choices(table=[
+        app_commands.Choice(name="Warp Hall", value="warp_hall"),
+        app_commands.Choice(name="The Mall", value="the_mall")
+    ])
+    @rate_limited("lookup")
+    @has_bot_permissions()
+    async def stallbatch(
+        self,
+        interaction: discord.Interaction,
+        table: app_commands.Choice[str],
+        stalls: str,
+        street: Optional[app_commands.Transform[str, StreetNameTransformer]] = None
+    ):
+        """Look up a list or range of stalls in one go"""
+        try:
+            numbers, ranges = parse_stall_spec(stalls)
+            if table.value == "warp_hall":
+                street = None  # Warp Hall has no streets
+                if not all(is_whole_number(number) for number in numbers):
+                    raise ValueError("Warp Hall stall numbers must be whole numbers (integers).")
+            elif street and street not in VALID_STREETS:
+                raise ValueError(f"Street name must be one of: {', '.join(VALID_STREETS)}")
+        except ValueError as e:
+            embed = discord.Embed(
+                title="Invalid Stall Numbers",
+                description=str(e),
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        result = await within_budget(
+            interaction, self.get_stall_batch(table.value, numbers, ranges, street, interaction.user.id),
+            self.config.fast_response_budget, self.bot.response_stats, "stallbatch"
+        )
+        
+        if "error" in result:
+            embed = discord.Embed(
+                title="Error",
+                description=result["error"],
+                color=0xe74c3c
+            )
+            await send(interaction, embed=embed)
+            return
+        
+        pages = self.build_stall_batch_pages(table.value, street, numbers, result)
+        if len(pages) > 1:
+            view = StallBatchView(pages, interaction.user.id)
+            await send(interaction, embed=pages[0], view=view)
+            view.message = await interaction.original_response()
+        else:
+            await send(interaction, embed=pages[0])
+
+    @app_commands.command(name="stalllist", description="Browse stalls in order of stall number")
+    @app_commands.describe(
+        table="The location to browse (warp or mall)",
+        street="Only list stalls on this street (The Mall only)"
+    )
+    @app_commands.choices(table=[
+        app_commands.Choice(name="Warp Hall", value="warp_hall"),
+        app_commands.Choice(name="The Mall", value="the_mall")
+    ])
+    @rate_limited("lookup")
+    @has_bot_permissions()
+    async def stalllist(
+        self,
+        interaction: discord.Interaction,
+        table: app_commands.Choice[str],
+        street: Optional[app_commands.Transform[str, StreetNameTransformer]] = None
+    ):
+        """List stalls a page at a time"""
+        if table.value == "warp_hall":
+            street = None  # Warp Hall has no streets
+        elif street and street not in VALID_STREETS:
+            embed = discord.Embed(
+                title="Invalid Street Name",
+                description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        result = await within_budget(
+            interaction, self.get_stall_page(table.value, street, None, interaction.user.id),
+            self.config.fast_response_budget, self.bot.response_stats, "stalllist"
+        )
+        embed, view = self.build_stall_list(table.value, street, 1, None, result, interaction.user.id)
+        await send(interaction, embed=embed, view=view)
+
     @app_commands.command(name="stallview", description="View details of a specific stall")
     @app_commands.describe(
         table="The location to search (warp or mall)",
@@ -261,14 +623,15 @@ class EntryGet(commands.Cog):
         app_commands.Choice(name="Warp Hall", value="warp_hall"),
         app_commands.Choice(name="The Mall", value="the_mall")
     ])
+    @rate_limited("lookup")
     @has_bot_permissions()
-    async def stallview(self, interaction: discord.Interaction, table: app_commands.Choice[str], stall_number: float):
+    async def stallview(self, interaction: discord.Interaction, table: app_commands.Choice[str], stall_number: app_commands.Transform[Decimal, StallNumberTransformer]):
         """View details of a specific stall"""
         
         # Validate stall number based on table type
         if table.value == "warp_hall":
             # Warp Hall requires integers
-            if not isinstance(stall_number, int) and not stall_number.is_integer():
+            if not is_whole_number(stall_number):
                 embed = discord.Embed(
                     title="Invalid Stall Number",
                     description="Warp Hall stall numbers must be whole numbers (integers).",
@@ -287,11 +650,15 @@ class EntryGet(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
+        # Quick lookups (stall directory hits) answer in one response; only slow ones defer
+        budget = self.config.fast_response_budget
+        stats = self.bot.response_stats
+        
         if table.value == "warp_hall":
             # For Warp Hall, directly get and show stall data
-            await interaction.response.defer()
-            
-            stall_data = await self.get_stall_data("warp_hall", stall_number)
+            stall_data = await within_budget(
+                interaction, self.get_stall_data("warp_hall", stall_number, interaction.user.id), budget, stats, "stallview"
+            )
             
             if "error" in stall_data:
                 embed = discord.Embed(
@@ -299,26 +666,26 @@ class EntryGet(commands.Cog):
                     description=stall_data["error"],
                     color=0xe74c3c
                 )
-                await interaction.followup.send(embed=embed)
+                await send(interaction, embed=embed)
                 return
             
             # Create and send embed
             embed = self.create_stall_embed("warp_hall", stall_data)
             if embed:
-                await interaction.followup.send(embed=embed)
+                await send(interaction, embed=mark_stale(embed, stall_data))
             else:
                 embed = discord.Embed(
                     title="Error",
                     description="Failed to create embed for stall data.",
                     color=0xe74c3c
                 )
-                await interaction.followup.send(embed=embed)
+                await send(interaction, embed=embed)
                 
         else:  # the_mall
             # For The Mall, first check if stall exists, then show street selection
-            await interaction.response.defer(ephemeral=True)
-            
-            stall_check = await self.check_mall_stall_exists(stall_number)
+            stall_check = await within_budget(
+                interaction, self.check_mall_stall_exists(stall_number, interaction.user.id), budget, stats, "stallview", ephemeral=True
+            )
             
             if "error" in stall_check:
                 embed = discord.Embed(
@@ -326,14 +693,14 @@ class EntryGet(commands.Cog):
                     description=stall_check["error"],
                     color=0xe74c3c
                 )
-                await interaction.followup.send(embed=embed, ephemeral=True)
+                await send(interaction, embed=embed, ephemeral=True)
                 return
             
             # Show street selection dropdown
-            view = StreetSelectionView(stall_number, self)
+            view = StreetSelectionView(stall_number)
             embed = discord.Embed(
                 title="Select Street Name",
-                description=f"Stall #{stall_number} found in The Mall. Please select which street to view:",
+                description=f"Stall #{format_stall_number(stall_number)} found in The Mall. Please select which street to view:",
                 color=0x3498db
             )
             
@@ -344,7 +711,7 @@ class EntryGet(commands.Cog):
                     inline=False
                 )
             
-            await interaction.followup.send(embed=embed, view=view, ephemeral=True)
+            await send(interaction, embed=mark_stale(embed, stall_check), view=view, ephemeral=True)
 
 async def setup(bot):
     """Setup function for the cog"""
@@ -1,34 +1,22 @@
 # Cog to handle The Mall stall reviews
 
 import asyncio
-import os
+from collections import deque
 import time
+from decimal import Decimal
 import discord
 from discord import app_commands
 from discord.ext import commands
-from dotenv import load_dotenv
 import pymysql as mariadb
 
-class StreetNameTransformer(app_commands.Transformer):
-    """Transformer for street name autocomplete"""
-    
-    VALID_STREETS = [
-        "Wall Street",
-        "Artist Alley", 
-        "Woke Ave",
-        "Five",
-        "Poland Street"
-    ]
-    
-    async def transform(self, interaction: discord.Interaction, value: str) -> str:
-        return value
-    
-    async def autocomplete(self, interaction: discord.Interaction, value: str) -> list[app_commands.Choice[str]]:
-        return [
-            app_commands.Choice(name=street, value=street)
-            for street in self.VALID_STREETS
-            if value.lower() in street.lower()
-        ][:25]
+from utils.audit import record_change
+from utils.ratelimit import rate_limited
+from utils.review_stats import apply_review_delta
+from utils.snapshot import OFFLINE_WRITE_ERROR
+from utils.stall_card import format_stall_number
+from utils.stall_number import StallNumberTransformer, parse_stall_number
+from utils.streets import VALID_STREETS, StreetNameTransformer
+from utils.textsig import simhash, words
 
 class ReviewModal(discord.ui.Modal):
     """Modal for submitting The Mall stall reviews"""
@@ -40,10 +28,7 @@ class ReviewModal(discord.ui.Modal):
         self.is_update = existing_review is not None
         
         # Format stall number for display
-        if isinstance(stall_number, float) and stall_number.is_integer():
-            stall_display = str(int(stall_number))
-        else:
-            stall_display = str(stall_number)
+        stall_display = format_stall_number(stall_number)
         
         # Keep title short to avoid Discord limits (45 chars max)
         if self.is_update:
@@ -103,6 +88,22 @@ class ReviewModal(discord.ui.Modal):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
         
+        # Check for copy-pasted review text across stalls
+        fingerprint, duplicate = self.cog.find_duplicate_review(interaction.user.id, self.stall_number, self.street_name, self.review_text.value)
+        if duplicate:
+            (_, dup_stall, dup_street), _, distance = duplicate
+            print(f"⚠️ Near-duplicate review from {interaction.user} ({interaction.user.id}) for stall {self.stall_number} on {self.street_name}: "
+                  f"{distance} bits from a review of stall {dup_stall} on {dup_street}")
+            if self.cog.config.review_duplicate_action == "reject":
+                embed = discord.Embed(
+                    title="Duplicate Review",
+                    description=f"This review is nearly identical to an existing review of stall #{format_stall_number(dup_stall)} on {dup_street}. "
+                                "Please write a review about this stall specifically.",
+                    color=0xe74c3c
+                )
+                await interaction.followup.send(embed=embed, ephemeral=True)
+                return
+        
         # Prepare review data
         review_data = {
             "ReviewerID": interaction.user.id,
@@ -114,9 +115,15 @@ class ReviewModal(discord.ui.Modal):
         }
         
         # Submit review
-        result = await self.cog.create_or_update_review(review_data, self.is_update)
+        # In flag mode the review is saved, with a note in its stall history for moderators
+        flagged = None
+        if duplicate:
+            flagged = {"SimilarTo": f"#{format_stall_number(dup_stall)} on {dup_street}", "DistanceBits": distance}
+        result = await self.cog.create_or_update_review(review_data, self.is_update, flagged)
         
         if result["success"]:
+            if fingerprint is not None:
+                self.cog.bot.review_index.add((interaction.user.id, self.stall_number, self.street_name), fingerprint)
             embed = self.cog.create_review_success_embed(review_data, self.is_update)
             await interaction.followup.send(embed=embed)
         else:
@@ -127,29 +134,144 @@ class ReviewModal(discord.ui.Modal):
             )
             await interaction.followup.send(embed=embed, ephemeral=True)
 
+class ReviewButton(discord.ui.DynamicItem[discord.ui.Button], template=r"fvi:review:(?P<stall>[0-9.]+):(?P<street>[A-Za-z ]+)"):
+    """Persistent button that opens the review form for a The Mall stall"""
+    
+    def __init__(self, stall_number, street_name: str, label: str = "Write Review"):
+        self.stall_number = stall_number
+        self.street_name = street_name
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=discord.ButtonStyle.primary,
+            emoji="📝",
+            custom_id=f"fvi:review:{format_stall_number(stall_number)}:{street_name}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(parse_stall_number(match["stall"]), match["street"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        """Look up the clicking user's review and open the review modal"""
+        cog = interaction.client.get_cog("EntryReview")
+        
+        existing_review = await cog.get_existing_review(interaction.user.id, self.stall_number, self.street_name)
+        if existing_review is None:
+            embed = discord.Embed(
+                title="Database Error",
+                description="Unable to check for existing reviews. Please try again.",
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        
+        # Pass only the data part, not the full dictionary with "exists" key
+        modal_existing_data = None
+        if existing_review.get("exists"):
+            modal_existing_data = {
+                "rating": existing_review["rating"],
+                "review_text": existing_review["review_text"]
+            }
+        
+        modal = ReviewModal(self.stall_number, self.street_name, cog, modal_existing_data)
+        await interaction.response.send_modal(modal)
+
 class EntryReview(commands.Cog):
     """Cog for handling The Mall stall reviews"""
     
     def __init__(self, bot):
         self.bot = bot
+        self.config = bot.config
+
+    async def cog_load(self):
+        # Dynamic items route clicks by custom_id, so buttons keep working across restarts and reloads
+        self.bot.add_dynamic_items(ReviewButton)
+
+        # The fingerprint index lives on the bot; only build it once, not on every reload
+        index = self.bot.review_index
+        if self.config.review_duplicate_action != "off" and not index.loaded and index.loader is None:
+            index.loader = asyncio.create_task(self.rebuild_review_index())
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(ReviewButton)
         
-    def get_db_connection(self):
-        """Get database connection"""
+    def get_db_connection(self, read_only: bool = False, replica: bool = False):
+        """Get a database connection from the bot's shared pool"""
         try:
-            conn = mariadb.connect(
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                host="furryville-index.db",
-                database="furryville"
-            )
-            return conn
+            return self.bot.db_pool.get_connection(read_only, replica)
         except mariadb.Error as e:
             print(f"Error connecting to MariaDB: {e}")
             return None
 
-    async def check_stall_exists(self, stall_number, street_name: str) -> bool:
+    async def rebuild_review_index(self):
+        """Fill the near-duplicate index from the_mall_reviews"""
+        index = self.bot.review_index
+        try:
+            entries = await asyncio.to_thread(self._stream_review_fingerprints)
+            if entries is None:
+                return  # Retried on the next load
+            
+            for key, fingerprint in entries:
+                index.add(key, fingerprint)
+            index.loaded = True
+            print(f"🔎 Indexed {len(index)} review fingerprints.")
+        except Exception as e:
+            print(f"Error building review index: {e}")
+        finally:
+            # Whatever happened, a later load may start a new build
+            index.loader = None
+
+    def _stream_review_fingerprints(self):
+        """Fingerprint the most recent reviews in one streaming pass (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=True)  # Full scan, best kept off the primary
+        if not conn:
+            return None
+        
+        try:
+            # Unbuffered cursor: rows are fingerprinted as they arrive instead of loading the whole table
+            cursor = conn.cursor(mariadb.cursors.SSCursor)
+            cursor.execute("SELECT ReviewerID, StallNumber, StreetName, ReviewText FROM the_mall_reviews ORDER BY ReviewID")
+            
+            recent = deque(maxlen=self.bot.review_index.capacity)
+            for reviewer_id, stall_number, street_name, review_text in cursor:
+                tokens = words(review_text)
+                if len(tokens) >= self.config.review_duplicate_min_words:
+                    recent.append(((reviewer_id, parse_stall_number(stall_number), street_name), simhash(tokens)))
+            
+            cursor.close()
+            conn.close()
+            return list(recent)
+            
+        except mariadb.Error as e:
+            print(f"Error building review index: {e}")
+            if conn:
+                conn.close()
+            return None
+
+    def find_duplicate_review(self, reviewer_id: int, stall_number, street_name: str, review_text: str):
+        """Fingerprint review text and look for a near-duplicate on another stall. Returns (fingerprint, match)"""
+        if self.config.review_duplicate_action == "off":
+            return None, None
+        
+        # Short reviews ("great stall!") legitimately repeat, so only check longer ones
+        tokens = words(review_text)
+        if len(tokens) < self.config.review_duplicate_min_words:
+            return None, None
+        
+        fingerprint = simhash(tokens)
+        matches = self.bot.review_index.find_similar(fingerprint, exclude=(reviewer_id, stall_number, street_name))
+        return fingerprint, matches[0] if matches else None
+
+    async def check_stall_exists(self, stall_number, street_name: str, user_id: int = None) -> bool:
         """Check if a stall exists in The Mall"""
-        conn = self.get_db_connection()
+        replica = self.bot.db_pool.replica_ok(user_id)
+        return await self.bot.single_flight.do(
+            ("mall_exists", stall_number, street_name, replica), asyncio.to_thread, self._query_stall_exists, stall_number, street_name, replica
+        )
+
+    def _query_stall_exists(self, stall_number, street_name: str, replica: bool = False) -> bool:
+        """Check a The Mall stall exists (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
         if not conn:
             return False
         
@@ -172,6 +294,10 @@ class EntryReview(commands.Cog):
 
     async def get_existing_review(self, reviewer_id: int, stall_number, street_name: str) -> dict:
         """Get existing review data for this stall, if any"""
+        return await asyncio.to_thread(self._get_existing_review, reviewer_id, stall_number, street_name)
+
+    def _get_existing_review(self, reviewer_id: int, stall_number, street_name: str) -> dict:
+        """Get existing review data for this stall, if any (blocking, run in a worker thread)"""
         conn = self.get_db_connection()
         if not conn:
             return None
@@ -202,6 +328,10 @@ class EntryReview(commands.Cog):
 
     async def update_reviewer_name(self, reviewer_id: int, new_name: str):
         """Silently update all reviews with matching ReviewerID to use the current display name"""
+        return await asyncio.to_thread(self._update_reviewer_name, reviewer_id, new_name)
+
+    def _update_reviewer_name(self, reviewer_id: int, new_name: str):
+        """Silently update all reviews with matching ReviewerID to use the current display name (blocking, run in a worker thread)"""
         conn = self.get_db_connection()
         if not conn:
             return
@@ -225,6 +355,7 @@ class EntryReview(commands.Cog):
                 update_query = "UPDATE the_mall_reviews SET ReviewerName = %s WHERE ReviewerID = %s"
                 cursor.execute(update_query, (new_name, reviewer_id))
                 conn.commit()
+                self.bot.db_pool.record_write(reviewer_id)
             
             cursor.close()
             conn.close()
@@ -234,11 +365,15 @@ class EntryReview(commands.Cog):
             if conn:
                 conn.close()
 
-    async def create_or_update_review(self, review_data: dict, is_update: bool = False) -> dict:
+    async def create_or_update_review(self, review_data: dict, is_update: bool = False, flagged: dict = None) -> dict:
         """Create a new review or update an existing one in the database"""
+        return await asyncio.to_thread(self._create_or_update_review, review_data, is_update, flagged)
+
+    def _create_or_update_review(self, review_data: dict, is_update: bool = False, flagged: dict = None) -> dict:
+        """Create a new review or update an existing one in the database (blocking, run in a worker thread)"""
         conn = self.get_db_connection()
         if not conn:
-            return {"success": False, "error": "Database connection failed"}
+            return {"success": False, "error": OFFLINE_WRITE_ERROR}
         
         try:
             cursor = conn.cursor()
@@ -272,12 +407,46 @@ class EntryReview(commands.Cog):
                     review_data["Rating"]
                 )
             
+            if is_update:
+                # Lock the row and grab the old rating so the stall aggregate can be adjusted by the difference
+                cursor.execute(
+                    "SELECT Rating, ReviewText FROM the_mall_reviews WHERE ReviewerID = %s AND StallNumber = %s AND StreetName = %s FOR UPDATE",
+                    (review_data["ReviewerID"], review_data["StallNumber"], review_data["StreetName"])
+                )
+                old = cursor.fetchone()
+            
             cursor.execute(update_query if is_update else insert_query, values)
+            
+            # The review was deleted (e.g. by a moderator) while the form was open
+            if is_update and (not old or cursor.rowcount == 0):
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return {"success": False, "error": "This review no longer exists. Run `/review` again to write a new one."}
+            
+            # Keep the stall's review aggregate in step, in the same transaction
+            if not is_update:
+                apply_review_delta(cursor, review_data["StallNumber"], review_data["StreetName"], 1, review_data["Rating"])
+            else:
+                apply_review_delta(cursor, review_data["StallNumber"], review_data["StreetName"], 0, review_data["Rating"] - old[0])
+            
+            after = {"ReviewerID": review_data["ReviewerID"], "Rating": review_data["Rating"], "ReviewText": review_data["ReviewText"]}
+            before = {"ReviewerID": review_data["ReviewerID"], "Rating": old[0], "ReviewText": old[1]} if is_update else None
+            record_change(
+                cursor, "the_mall_reviews", review_data["StallNumber"], review_data["StreetName"],
+                "review_edit" if is_update else "review_create", review_data["ReviewerID"], before, after
+            )
+            if flagged:
+                record_change(
+                    cursor, "the_mall_reviews", review_data["StallNumber"], review_data["StreetName"],
+                    "review_flagged", review_data["ReviewerID"], None, {"ReviewerID": review_data["ReviewerID"], **flagged}
+                )
             conn.commit()
             
             cursor.close()
             conn.close()
             
+            self.bot.db_pool.record_write(review_data["ReviewerID"])
             return {"success": True}
             
         except mariadb.Error as e:
@@ -289,11 +458,7 @@ class EntryReview(commands.Cog):
     def create_review_success_embed(self, review_data: dict, is_update: bool = False) -> discord.Embed:
         """Create a success embed for submitted review"""
         # Format stall number
-        stall_number = review_data["StallNumber"]
-        if isinstance(stall_number, float) and stall_number.is_integer():
-            stall_number_display = str(int(stall_number))
-        else:
-            stall_number_display = str(stall_number)
+        stall_number_display = format_stall_number(review_data["StallNumber"])
         
         # Create star display
         stars = "⭐" * review_data["Rating"] + "☆" * (5 - review_data["Rating"])
@@ -322,7 +487,8 @@ class EntryReview(commands.Cog):
         stall_number="The stall number to review",
         street_name="The street name where the stall is located"
     )
-    async def review(self, interaction: discord.Interaction, stall_number: float, street_name: StreetNameTransformer):
+    @rate_limited("review")
+    async def review(self, interaction: discord.Interaction, stall_number: app_commands.Transform[Decimal, StallNumberTransformer], street_name: app_commands.Transform[str, StreetNameTransformer]):
         """Submit a review for a The Mall stall"""
         
         # Validate stall number (The Mall allows decimals)
@@ -336,18 +502,10 @@ class EntryReview(commands.Cog):
             return
         
         # Validate street name
-        valid_streets = [
-            "Wall Street",
-            "Artist Alley", 
-            "Woke Ave",
-            "Five",
-            "Poland Street"
-        ]
-        
-        if street_name not in valid_streets:
+        if street_name not in VALID_STREETS:
             embed = discord.Embed(
                 title="Invalid Street Name",
-                description=f"Street name must be one of: {', '.join(valid_streets)}",
+                description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
                 color=0xe74c3c
             )
             await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -359,11 +517,11 @@ class EntryReview(commands.Cog):
         await self.update_reviewer_name(interaction.user.id, interaction.user.display_name)
         
         # Check if stall exists
-        stall_exists = await self.check_stall_exists(stall_number, street_name)
+        stall_exists = await self.check_stall_exists(stall_number, street_name, interaction.user.id)
         if not stall_exists:
             embed = discord.Embed(
                 title="Error",
-                description=f"No stall found with number {stall_number} on {street_name}",
+                description=f"No stall found with number {format_stall_number(stall_number)} on {street_name}",
                 color=0xe74c3c
             )
             await interaction.followup.send(embed=embed, ephemeral=True)
@@ -381,37 +539,7 @@ class EntryReview(commands.Cog):
             return
         
         # Format stall number for display
-        if isinstance(stall_number, float) and stall_number.is_integer():
-            stall_number_display = str(int(stall_number))
-        else:
-            stall_number_display = str(stall_number)
-        
-        # Create review button with appropriate messaging
-        class ReviewButton(discord.ui.View):
-            def __init__(self, stall_number, street_name, cog, existing_review=None):
-                super().__init__(timeout=60)
-                self.stall_number = stall_number
-                self.street_name = street_name
-                self.cog = cog
-                self.existing_review = existing_review
-                self.has_existing = existing_review is not None and existing_review.get("exists", False)
-            
-            @discord.ui.button(label="Edit Review", style=discord.ButtonStyle.primary, emoji="📝")
-            async def open_review_modal(self, button_interaction: discord.Interaction, button: discord.ui.Button):
-                # Update button label based on whether review exists
-                if not self.has_existing:
-                    button.label = "Write Review"
-                
-                # Pass only the data part, not the full dictionary with "exists" key
-                modal_existing_data = None
-                if self.has_existing and self.existing_review:
-                    modal_existing_data = {
-                        "rating": self.existing_review["rating"],
-                        "review_text": self.existing_review["review_text"]
-                    }
-                
-                modal = ReviewModal(self.stall_number, self.street_name, self.cog, modal_existing_data)
-                await button_interaction.response.send_modal(modal)
+        stall_number_display = format_stall_number(stall_number)
         
         if existing_review.get("exists"):
             # Show existing review info and edit option
@@ -423,7 +551,7 @@ class EntryReview(commands.Cog):
             )
             embed.add_field(name="Current Rating", value=f"{stars} ({existing_review['rating']}/5)", inline=False)
             embed.add_field(name="Current Review", value=existing_review["review_text"][:500] + ("..." if len(existing_review["review_text"]) > 500 else ""), inline=False)
-            view = ReviewButton(stall_number, street_name, self, existing_review)
+            label = "Edit Review"
         else:
             # Show new review option
             embed = discord.Embed(
@@ -431,8 +559,11 @@ class EntryReview(commands.Cog):
                 description=f"Click the button below to submit a review for stall #{stall_number_display} on {street_name}.",
                 color=0x3498db
             )
-            view = ReviewButton(stall_number, street_name, self, None)
+            label = "Write Review"
         
+        # Stateless button; the stall lives in the custom_id and the review is re-read on click
+        view = discord.ui.View(timeout=None)
+        view.add_item(ReviewButton(stall_number, street_name, label))
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
 async def setup(bot):
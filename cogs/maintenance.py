@@ -1,23 +1,77 @@
 import asyncio
-import os
+import datetime
 import time
 import discord
 from discord import app_commands
 from discord.ext import commands
-from dotenv import load_dotenv
 
-load_dotenv()
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14, minutes=-5)  # Discord rejects bulk deletes of 14+ day old messages
+BULK_DELETE_CHUNK = 100
+SINGLE_DELETE_CONCURRENCY = 3
+MAX_SCAN_DEPTH = 1000
+MAX_PURGE_COUNT = 500
 
-OWNER_ID = int(os.getenv("POSTMAN_ID"))  # Get owner ID from .env
+class PurgeModal(discord.ui.Modal):
+    """Modal for choosing how far back to scan and how many messages to purge"""
+
+    def __init__(self, view):
+        super().__init__(title="Purge Bot Messages", timeout=120)
+        self.view = view
+
+        self.scan_depth = discord.ui.TextInput(
+            label=f"Messages to scan (max {MAX_SCAN_DEPTH})",
+            default="200",
+            required=True,
+            max_length=4
+        )
+        self.add_item(self.scan_depth)
+
+        self.max_count = discord.ui.TextInput(
+            label=f"Messages to delete (max {MAX_PURGE_COUNT})",
+            default="100",
+            required=True,
+            max_length=3
+        )
+        self.add_item(self.max_count)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            scan_depth = int(self.scan_depth.value)
+            max_count = int(self.max_count.value)
+            if scan_depth <= 0 or max_count <= 0:
+                raise ValueError("Values must be positive")
+        except ValueError:
+            await interaction.response.send_message("❌ Scan depth and count must be positive whole numbers.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        await self.view.run_purge(interaction, min(scan_depth, MAX_SCAN_DEPTH), min(max_count, MAX_PURGE_COUNT))
 
 class MaintenanceView(discord.ui.View):
+    RELOAD_ALL = "__all__"
+    REGRESSION_FACTOR = 1.5  # Flag reloads that got this much slower than last time...
+    REGRESSION_MIN_MS = 50   # ...and by at least this many milliseconds
+
     def __init__(self, cog, message: discord.Message):
         super().__init__(timeout=60)
         self.cog = cog
         self.message = message
 
+        # Create dropdown with every loaded extension plus a reload-all option
+        extensions = sorted(self.cog.bot.extensions)[:24]
+        select = discord.ui.Select(
+            placeholder="Reload a cog...",
+            options=[discord.SelectOption(label="Reload all cogs", value=self.RELOAD_ALL, emoji="🔁")] + [
+                discord.SelectOption(label=name, value=name, emoji="📂")
+                for name in extensions
+            ],
+            row=0
+        )
+        select.callback = self.reload_selected
+        self.add_item(select)
+
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if interaction.user.id != OWNER_ID:
+        if not self.cog.bot.authorizer.is_owner(interaction.user.id):
             await interaction.response.send_message("❌ You are not authorized to use this panel.", ephemeral=True)
             return False
         return True
@@ -61,25 +115,107 @@ class MaintenanceView(discord.ui.View):
         except Exception:
             pass
 
-    @discord.ui.button(label="Purge Messages", emoji="🧹", style=discord.ButtonStyle.danger)
-    async def purge_messages(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def reload_one(self, name: str) -> tuple:
+        """Reload a single extension, returning (name, seconds, error)"""
+        started = time.perf_counter()
+        try:
+            await self.cog.bot.reload_extension(name)
+            error = None
+        except Exception as e:
+            error = e
+        return name, time.perf_counter() - started, error
+
+    async def reload_selected(self, interaction: discord.Interaction):
+        """Handle dropdown selection and reload one or all extensions concurrently"""
         await interaction.response.defer(ephemeral=True)
 
+        choice = interaction.data['values'][0]
+        names = sorted(self.cog.bot.extensions) if choice == self.RELOAD_ALL else [choice]
+        results = await asyncio.gather(*(self.reload_one(name) for name in names))
+
+        # Previous timings live on the bot so they survive reloading this cog
+        timings = self.cog.bot.shared_cache("reload_timings", dict)
+        lines = []
+        for name, seconds, error in results:
+            ms = seconds * 1000
+            if error:
+                lines.append(f"❌ `{name}` failed after {ms:.0f} ms: {error}")
+                continue
+
+            line = f"✅ `{name}` reloaded in {ms:.0f} ms"
+            previous = timings.get(name)
+            if previous is not None and ms > previous * self.REGRESSION_FACTOR and ms - previous > self.REGRESSION_MIN_MS:
+                line += f" ⚠️ slower than last reload ({previous:.0f} ms)"
+            timings[name] = ms
+            lines.append(line)
+
+        await self.quick_ephemeral(interaction, "\n".join(lines))
+        await self.fadeout_panel()
+
+    @discord.ui.button(label="Purge Messages", emoji="🧹", style=discord.ButtonStyle.danger, row=1)
+    async def purge_messages(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(PurgeModal(self))
+
+    async def run_purge(self, interaction: discord.Interaction, scan_depth: int, max_count: int):
+        """Delete the bot's recent messages with bulk-delete, falling back to single deletes for old ones"""
+        channel = interaction.channel
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+
+        # Collect eligible messages first so bulk deletes can be chunked
+        recent, old = [], []
+        async for msg in channel.history(limit=scan_depth):
+            if msg.author != self.cog.bot.user or msg.id == self.message.id:
+                continue
+            (recent if msg.created_at > cutoff else old).append(msg)
+            if len(recent) + len(old) >= max_count:
+                break
+
+        total = len(recent) + len(old)
         deleted = 0
-        async for msg in interaction.channel.history(limit=50):
-            if msg.author == self.cog.bot.user:
-                if msg.id == self.message.id:
-                    continue
+        progress = await interaction.followup.send(f"🧹 Found {total} messages to purge...", ephemeral=True, wait=True)
+
+        async def report():
+            try:
+                await progress.edit(content=f"🧹 Purging... {deleted}/{total}")
+            except discord.HTTPException:
+                pass
+
+        # Bulk delete in chunks of up to 100 messages per API call
+        for i in range(0, len(recent), BULK_DELETE_CHUNK):
+            chunk = recent[i:i + BULK_DELETE_CHUNK]
+            try:
+                if len(chunk) == 1:
+                    await chunk[0].delete()
+                else:
+                    await channel.delete_messages(chunk)
+                deleted += len(chunk)
+            except discord.Forbidden:
+                # Bulk delete needs Manage Messages; single deletes of our own messages do not
+                old.extend(chunk)
+            except discord.HTTPException:
+                pass
+            await report()
+
+        # Messages too old for bulk delete go one by one with bounded concurrency.
+        # discord.py waits out 429s per route, so the semaphore just keeps us from queueing a burst
+        semaphore = asyncio.Semaphore(SINGLE_DELETE_CONCURRENCY)
+
+        async def delete_single(msg: discord.Message):
+            nonlocal deleted
+            async with semaphore:
                 try:
                     await msg.delete()
                     deleted += 1
-                    await asyncio.sleep(0.5)  # Slow down to avoid rate limits
-                except Exception:
+                except discord.HTTPException:
                     pass
-                if deleted >= 10:
-                    break
 
-        await self.quick_ephemeral(interaction, f"🧹 Purged {deleted} messages.")
+        if old:
+            await asyncio.gather(*(delete_single(msg) for msg in old))
+
+        try:
+            await progress.edit(content=f"🧹 Purged {deleted}/{total} messages ({len(recent)} bulk, {len(old)} single).")
+        except discord.HTTPException:
+            pass
         await self.fadeout_panel()
 
     # @discord.ui.button(label="Sync Commands", emoji="🔄", style=discord.ButtonStyle.primary)
@@ -90,67 +226,16 @@ class MaintenanceView(discord.ui.View):
     #     await self.quick_ephemeral(interaction, "🔄 Global slash commands synced! (May take up to 1 hour)")
     #     await self.fadeout_panel()
 
-    @discord.ui.button(label="Reload StallCreate", emoji="📂", style=discord.ButtonStyle.success)
-    async def reload_stall_create(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer(ephemeral=True)
-
-        try:
-            await self.cog.bot.reload_extension("cogs.entry_create")
-            result = "✅ Reloaded `cogs.entry_create` successfully!"
-        except Exception as e:
-            result = f"❌ Failed to reload entry create cog: {e}"
-
-        await self.quick_ephemeral(interaction, result)
-        await self.fadeout_panel()
-
-    @discord.ui.button(label="Reload StallEdit", emoji="📂", style=discord.ButtonStyle.success)
-    async def reload_stall_edit(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer(ephemeral=True)
-
-        try:
-            await self.cog.bot.reload_extension("cogs.entry_edit")
-            result = "✅ Reloaded `cogs.entry_edit` successfully!"
-        except Exception as e:
-            result = f"❌ Failed to reload entry edit cog: {e}"
-
-        await self.quick_ephemeral(interaction, result)
-        await self.fadeout_panel()
-
-    @discord.ui.button(label="Reload StallView", emoji="📂", style=discord.ButtonStyle.success)
-    async def reload_stall_view(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer(ephemeral=True)
-
-        try:
-            await self.cog.bot.reload_extension("cogs.entry_get")
-            result = "✅ Reloaded `cogs.entry_get` successfully!"
-        except Exception as e:
-            result = f"❌ Failed to reload entry get cog: {e}"
-
-        await self.quick_ephemeral(interaction, result)
-        await self.fadeout_panel()
-
-    @discord.ui.button(label="Reload Maintenance Cog", emoji="🛠️", style=discord.ButtonStyle.success)
-    async def reload_maintenance(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.defer(ephemeral=True)
-
-        try:
-            await self.cog.bot.reload_extension("cogs.maintenance")
-            result = "✅ Reloaded `cogs.maintenance` successfully!"
-        except Exception as e:
-            result = f"❌ Failed to reload maintenance cog: {e}"
-
-        await self.quick_ephemeral(interaction, result)
-        await self.fadeout_panel()
-
-    @discord.ui.button(label="Restart Bot", emoji="♻️", style=discord.ButtonStyle.success)
+    @discord.ui.button(label="Restart Bot", emoji="♻️", style=discord.ButtonStyle.success, row=1)
     async def restart_bot(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer(ephemeral=True)
-        await self.quick_ephemeral(interaction, "♻️ Restarting bot...")
+        await interaction.followup.send("♻️ Draining in-flight commands and restarting bot...", ephemeral=True)
         await self.fadeout_panel()
-        await asyncio.sleep(1)
-        os._exit(0)
+        # Graceful close: drain interactions, close the pool. The process supervisor restarts us.
+        # Started as its own task: this callback counts as in-flight, so awaiting the drain here would wait on itself
+        self.cog.restart_task = asyncio.create_task(self.cog.bot.close())
 
-    @discord.ui.button(label="Cancel", emoji="❌", style=discord.ButtonStyle.secondary)
+    @discord.ui.button(label="Cancel", emoji="❌", style=discord.ButtonStyle.secondary, row=1)
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
             await interaction.message.delete()
@@ -160,18 +245,21 @@ class MaintenanceView(discord.ui.View):
 class Maintenance(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.config = bot.config
         self.tree = bot.tree
         self.start_time = time.time()  # Track when bot started
+        self.restart_task = None
 
     @app_commands.guild_only()
     @app_commands.command(name="maintenance", description="Opens the maintenance control panel (owner only)")
     async def maintenance_panel(self, inter: discord.Interaction):
-        if inter.user.id != OWNER_ID:
+        if not self.bot.authorizer.is_owner(inter.user.id):
             return await inter.response.send_message("❌ You are not authorized to run this command.", ephemeral=True)
 
         embed = discord.Embed(
             title="🛠️ Fvi-Furr Maintenance Panel",
-            description=f"Use the buttons below to perform maintenance actions.\n\n**Uptime:** {self.get_uptime_string()}",
+            description=f"Use the buttons below to perform maintenance actions.\n\n**Uptime:** {self.get_uptime_string()}"
+                        f"\n**Lookups:** {self.bot.response_stats.summary()}",
             color=discord.Color.orange()
         )
         embed.set_footer(text="Panel will timeout after 60 seconds.")
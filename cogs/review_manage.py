@@ -0,0 +1,429 @@
+# Cog for listing reviews and moderator review management
+
+import asyncio
+from decimal import Decimal
+from typing import Optional
+import discord
+from discord import app_commands
+from discord.ext import commands
+import pymysql as mariadb
+
+from utils.audit import audit_row, record_change, record_changes
+from utils.permissions import has_bot_permissions, is_moderator
+from utils.ratelimit import rate_limited
+from utils.review_stats import apply_review_delta, apply_deleted_reviews
+from utils.snapshot import OFFLINE_WRITE_ERROR, mark_stale
+from utils.stall_card import format_stall_number
+from utils.stall_number import StallNumberTransformer, parse_stall_number
+from utils.streets import VALID_STREETS, StreetNameTransformer
+from utils.textsig import simhash, words
+
+REVIEW_LIST_LIMIT = 10
+REVIEW_DELETE_CHUNK = 500  # Rows per transaction when purging a reviewer, keeps row locks short
+
+class ReviewManage(commands.Cog):
+    """Cog for listing reviews and moderator edits/deletes by ReviewID"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.config = bot.config
+
+    def get_db_connection(self, read_only: bool = False, replica: bool = False):
+        """Get a database connection from the bot's shared pool"""
+        try:
+            return self.bot.db_pool.get_connection(read_only, replica)
+        except mariadb.Error as e:
+            print(f"Error connecting to MariaDB: {e}")
+            return None
+
+    async def get_stall_reviews(self, stall_number, street_name: str, user_id: int = None) -> dict:
+        """Get a stall's most recent reviews and its rating aggregate"""
+        replica = self.bot.db_pool.replica_ok(user_id)
+        return await self.bot.single_flight.do(
+            ("reviews", stall_number, street_name, replica), asyncio.to_thread, self._query_stall_reviews, stall_number, street_name, replica
+        )
+
+    def _query_stall_reviews(self, stall_number, street_name: str, replica: bool = False) -> dict:
+        """Query reviews (via idx_stall_street) and the stats row (blocking, run in a worker thread)"""
+        conn = self.get_db_connection(read_only=True, replica=replica)
+        if not conn:
+            return self.bot.snapshot.stall_reviews(stall_number, street_name, REVIEW_LIST_LIMIT)
+
+        try:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT ReviewCount, RatingTotal FROM the_mall_review_stats WHERE StallNumber = %s AND StreetName = %s",
+                (stall_number, street_name)
+            )
+            stats = cursor.fetchone()
+
+            query = """
+            SELECT ReviewID, ReviewerName, Rating, ReviewText
+            FROM the_mall_reviews
+            WHERE StallNumber = %s AND StreetName = %s
+            ORDER BY UpdatedAt DESC
+            LIMIT %s
+            """
+            cursor.execute(query, (stall_number, street_name, REVIEW_LIST_LIMIT))
+            rows = cursor.fetchall()
+
+            cursor.close()
+            conn.close()
+
+            columns = ["ReviewID", "ReviewerName", "Rating", "ReviewText"]
+            return {
+                "reviews": [dict(zip(columns, row)) for row in rows],
+                "count": stats[0] if stats else 0,
+                "rating_total": stats[1] if stats else 0
+            }
+
+        except mariadb.Error as e:
+            print(f"Error querying reviews: {e}")
+            if conn:
+                conn.close()
+            return {"error": f"Database query failed: {str(e)}"}
+
+    def update_review_index(self, reviewer_id: int, stall_number, street_name: str, review_text: str = None):
+        """Keep the near-duplicate index in step with a moderated review. No text removes it"""
+        if self.config.review_duplicate_action == "off":
+            return  # The index isn't built or consulted
+        key = (reviewer_id, parse_stall_number(stall_number), street_name)
+        tokens = words(review_text) if review_text is not None else []
+        # Same minimum length as EntryReview.find_duplicate_review, shorter reviews aren't indexed
+        if len(tokens) >= self.config.review_duplicate_min_words:
+            self.bot.review_index.add(key, simhash(tokens))
+        else:
+            self.bot.review_index.remove(key)
+
+    async def edit_review(self, review_id: int, rating: Optional[int], review_text: Optional[str], changed_by: int = None) -> dict:
+        result = await asyncio.to_thread(self._edit_review, review_id, rating, review_text, changed_by)
+        if result["success"]:
+            review = result["review"]
+            self.update_review_index(review["ReviewerID"], review["StallNumber"], review["StreetName"], review["ReviewText"])
+        return result
+
+    def _edit_review(self, review_id: int, rating: Optional[int], review_text: Optional[str], changed_by: int = None) -> dict:
+        """Edit a review by primary key, adjusting the stall aggregate by the rating difference"""
+        conn = self.get_db_connection()
+        if not conn:
+            return {"success": False, "error": OFFLINE_WRITE_ERROR}
+
+        try:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT StallNumber, StreetName, Rating, ReviewerName, ReviewText, ReviewerID FROM the_mall_reviews WHERE ReviewID = %s FOR UPDATE",
+                (review_id,)
+            )
+            existing = cursor.fetchone()
+            if not existing:
+                cursor.close()
+                conn.close()
+                return {"success": False, "error": f"No review found with ID {review_id}"}
+
+            stall_number, street_name, old_rating, reviewer_name, old_text, reviewer_id = existing
+            new_rating = rating if rating is not None else old_rating
+            new_text = review_text if review_text is not None else old_text
+
+            cursor.execute(
+                "UPDATE the_mall_reviews SET Rating = %s, ReviewText = %s, UpdatedAt = CURRENT_TIMESTAMP WHERE ReviewID = %s",
+                (new_rating, new_text, review_id)
+            )
+            if new_rating != old_rating:
+                apply_review_delta(cursor, stall_number, street_name, 0, new_rating - old_rating)
+            record_change(
+                cursor, "the_mall_reviews", stall_number, street_name, "review_edit", changed_by,
+                before={"ReviewID": review_id, "ReviewerID": reviewer_id, "Rating": old_rating, "ReviewText": old_text},
+                after={"ReviewID": review_id, "ReviewerID": reviewer_id, "Rating": new_rating, "ReviewText": new_text}
+            )
+            conn.commit()
+
+            cursor.close()
+            conn.close()
+
+            self.bot.db_pool.record_write(changed_by)
+            return {
+                "success": True,
+                "review": {
+                    "ReviewID": review_id,
+                    "ReviewerID": reviewer_id,
+                    "StallNumber": stall_number,
+                    "StreetName": street_name,
+                    "ReviewerName": reviewer_name,
+                    "Rating": new_rating,
+                    "ReviewText": new_text
+                }
+            }
+
+        except mariadb.Error as e:
+            print(f"Error editing review {review_id}: {e}")
+            if conn:
+                conn.close()
+            return {"success": False, "error": f"Database error: {str(e)}"}
+
+    async def delete_review(self, review_id: int, changed_by: int = None) -> dict:
+        result = await asyncio.to_thread(self._delete_review, review_id, changed_by)
+        if result["success"]:
+            self.update_review_index(result["ReviewerID"], result["StallNumber"], result["StreetName"])
+        return result
+
+    def _delete_review(self, review_id: int, changed_by: int = None) -> dict:
+        """Delete a review by primary key and subtract it from the stall aggregate"""
+        conn = self.get_db_connection()
+        if not conn:
+            return {"success": False, "error": OFFLINE_WRITE_ERROR}
+
+        try:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT StallNumber, StreetName, Rating, ReviewerName, ReviewerID, ReviewText FROM the_mall_reviews WHERE ReviewID = %s FOR UPDATE",
+                (review_id,)
+            )
+            existing = cursor.fetchone()
+            if not existing:
+                cursor.close()
+                conn.close()
+                return {"success": False, "error": f"No review found with ID {review_id}"}
+
+            cursor.execute("DELETE FROM the_mall_reviews WHERE ReviewID = %s", (review_id,))
+            apply_deleted_reviews(cursor, [existing[:3]])
+            record_change(
+                cursor, "the_mall_reviews", existing[0], existing[1], "review_delete", changed_by,
+                before={"ReviewID": review_id, "ReviewerID": existing[4], "Rating": existing[2], "ReviewText": existing[5]}
+            )
+            conn.commit()
+
+            cursor.close()
+            conn.close()
+
+            self.bot.db_pool.record_write(changed_by)
+            return {"success": True, "StallNumber": existing[0], "StreetName": existing[1], "ReviewerName": existing[3], "ReviewerID": existing[4]}
+
+        except mariadb.Error as e:
+            print(f"Error deleting review {review_id}: {e}")
+            if conn:
+                conn.close()
+            return {"success": False, "error": f"Database error: {str(e)}"}
+
+    async def purge_reviewer(self, reviewer_id: int, changed_by: int = None) -> dict:
+        result = await asyncio.to_thread(self._purge_reviewer, reviewer_id, changed_by)
+        # Earlier chunks are committed even when a later one fails, so drop the fingerprints either way
+        if result["deleted"]:
+            index = self.bot.review_index
+            for key in index.keys():
+                if key[0] == reviewer_id:
+                    index.remove(key)
+        return result
+
+    def _purge_reviewer(self, reviewer_id: int, changed_by: int = None) -> dict:
+        """Delete every review by a user in chunked transactions so the table is never locked for long"""
+        conn = self.get_db_connection()
+        if not conn:
+            return {"success": False, "error": OFFLINE_WRITE_ERROR, "deleted": 0}
+
+        deleted = 0
+        try:
+            cursor = conn.cursor()
+
+            while True:
+                # idx_reviewer_id makes each chunk a short index range scan
+                cursor.execute(
+                    "SELECT ReviewID, StallNumber, StreetName, Rating, ReviewText FROM the_mall_reviews WHERE ReviewerID = %s LIMIT %s FOR UPDATE",
+                    (reviewer_id, REVIEW_DELETE_CHUNK)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                placeholders = ", ".join(["%s"] * len(rows))
+                cursor.execute(f"DELETE FROM the_mall_reviews WHERE ReviewID IN ({placeholders})", [row[0] for row in rows])
+                apply_deleted_reviews(cursor, [row[1:4] for row in rows])
+                record_changes(cursor, [
+                    audit_row(
+                        "the_mall_reviews", stall_number, street_name, "review_delete", changed_by,
+                        before={"ReviewID": review_id, "ReviewerID": reviewer_id, "Rating": rating, "ReviewText": text}
+                    )
+                    for review_id, stall_number, street_name, rating, text in rows
+                ])
+                conn.commit()
+                deleted += len(rows)
+
+            cursor.close()
+            conn.close()
+
+            self.bot.db_pool.record_write(changed_by)
+            return {"success": True, "deleted": deleted}
+
+        except mariadb.Error as e:
+            print(f"Error purging reviews by {reviewer_id}: {e}")
+            if conn:
+                conn.close()
+            return {"success": False, "error": f"Database error: {str(e)}", "deleted": deleted}
+
+    @app_commands.command(name="reviewlist", description="List reviews for a The Mall stall")
+    @app_commands.describe(
+        stall_number="The stall number",
+        street_name="The street name where the stall is located"
+    )
+    @rate_limited("lookup")
+    async def reviewlist(self, interaction: discord.Interaction, stall_number: app_commands.Transform[Decimal, StallNumberTransformer], street_name: app_commands.Transform[str, StreetNameTransformer]):
+        """List reviews for a stall, with ReviewIDs for moderators"""
+        if street_name not in VALID_STREETS:
+            embed = discord.Embed(
+                title="Invalid Street Name",
+                description=f"Street name must be one of: {', '.join(VALID_STREETS)}",
+                color=0xe74c3c
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        # Moderators see ReviewIDs, so keep their copy private
+        show_ids = is_moderator(interaction)
+        await interaction.response.defer(ephemeral=show_ids)
+
+        result = await self.get_stall_reviews(stall_number, street_name, interaction.user.id)
+        if "error" in result:
+            embed = discord.Embed(
+                title="Error",
+                description=result["error"],
+                color=0xe74c3c
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        stall_number_display = format_stall_number(stall_number)
+        embed = discord.Embed(
+            title=f"Reviews for The Mall Stall #{stall_number_display} on {street_name}",
+            color=0x3498db
+        )
+
+        if not result["reviews"]:
+            embed.description = "No reviews yet. Use `/review` to write the first one!"
+        else:
+            if result["count"]:
+                average = result["rating_total"] / result["count"]
+                embed.description = f"⭐ **{average:.1f}/5** from {result['count']} review(s)"
+
+            for review in result["reviews"]:
+                stars = "⭐" * review["Rating"] + "☆" * (5 - review["Rating"])
+                name = f"{stars} {review['ReviewerName']}"
+                if show_ids:
+                    name += f" (ID {review['ReviewID']})"
+                text = review["ReviewText"]
+                embed.add_field(name=name, value=text[:200] + ("..." if len(text) > 200 else ""), inline=False)
+
+            if result["count"] > len(result["reviews"]):
+                embed.set_footer(text=f"Showing the {len(result['reviews'])} most recent reviews • Furryville Index Database")
+
+        if not embed.footer.text:
+            embed.set_footer(text="Furryville Index Database")
+        await interaction.followup.send(embed=mark_stale(embed, result))
+
+    @app_commands.command(name="reviewedit", description="Edit another user's review by its ID (mod only)")
+    @app_commands.describe(
+        review_id="The review's ID (shown to moderators in /reviewlist)",
+        rating="New rating from 1 to 5 (leave empty to keep)",
+        review_text="New review text (leave empty to keep)"
+    )
+    @rate_limited("write")
+    @has_bot_permissions()
+    async def reviewedit(
+        self,
+        interaction: discord.Interaction,
+        review_id: int,
+        rating: Optional[app_commands.Range[int, 1, 5]] = None,
+        review_text: Optional[app_commands.Range[str, 1, 1000]] = None
+    ):
+        """Edit a review by primary key"""
+        if rating is None and review_text is None:
+            embed = discord.Embed(
+                title="No Changes Made",
+                description="Provide a new rating and/or review text.",
+                color=0xffaa00
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        result = await self.edit_review(review_id, rating, review_text, interaction.user.id)
+
+        if not result["success"]:
+            embed = discord.Embed(
+                title="Error Editing Review",
+                description=result["error"],
+                color=0xe74c3c
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        review = result["review"]
+        stars = "⭐" * review["Rating"] + "☆" * (5 - review["Rating"])
+        embed = discord.Embed(
+            title=f"✅ Review {review_id} Updated",
+            color=0x00ff00
+        )
+        embed.add_field(name="Reviewer", value=review["ReviewerName"], inline=True)
+        embed.add_field(name="Stall Number", value=format_stall_number(review["StallNumber"]), inline=True)
+        embed.add_field(name="Street", value=review["StreetName"], inline=True)
+        embed.add_field(name="Rating", value=f"{stars} ({review['Rating']}/5)", inline=False)
+        embed.add_field(name="Review", value=review["ReviewText"], inline=False)
+        embed.set_footer(text="Furryville Index Database")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="reviewdelete", description="Delete a review by its ID (mod only)")
+    @app_commands.describe(review_id="The review's ID (shown to moderators in /reviewlist)")
+    @rate_limited("write")
+    @has_bot_permissions()
+    async def reviewdelete(self, interaction: discord.Interaction, review_id: int):
+        """Delete a review by primary key"""
+        await interaction.response.defer(ephemeral=True)
+        result = await self.delete_review(review_id, interaction.user.id)
+
+        if not result["success"]:
+            embed = discord.Embed(
+                title="Error Deleting Review",
+                description=result["error"],
+                color=0xe74c3c
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title=f"🗑️ Review {review_id} Deleted",
+            description=f"Removed {result['ReviewerName']}'s review of stall #{format_stall_number(result['StallNumber'])} on {result['StreetName']}.",
+            color=0x00ff00
+        )
+        embed.set_footer(text="Furryville Index Database")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="reviewpurge", description="Delete every review written by a user (mod only)")
+    @app_commands.describe(user="The user whose reviews should be deleted")
+    @rate_limited("write")
+    @has_bot_permissions()
+    async def reviewpurge(self, interaction: discord.Interaction, user: discord.User):
+        """Delete all reviews by a ReviewerID, e.g. after a ban wave"""
+        await interaction.response.defer(ephemeral=True)
+        result = await self.purge_reviewer(user.id, interaction.user.id)
+
+        if not result["success"]:
+            embed = discord.Embed(
+                title="Error Purging Reviews",
+                description=f"{result['error']}\n{result['deleted']} review(s) were deleted before the error.",
+                color=0xe74c3c
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title="🗑️ Reviews Purged",
+            description=f"Deleted {result['deleted']} review(s) by {user.mention}.",
+            color=0x00ff00
+        )
+        embed.set_footer(text="Furryville Index Database")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    """Setup function for the cog"""
+    await bot.add_cog(ReviewManage(bot))
@@ -0,0 +1,17 @@
+-- Append-only change history for stalls and reviews
+-- Rows are only ever inserted, in the same transaction as the change they describe
+
+CREATE TABLE IF NOT EXISTS stall_audit_log (
+    AuditID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    TableName VARCHAR(32) NOT NULL,               -- warp_hall, the_mall or the_mall_reviews
+    StallNumber DOUBLE NOT NULL,                  -- Same type as the_mall.StallNumber
+    StreetName VARCHAR(255) NOT NULL DEFAULT '',  -- Empty for Warp Hall so the index prefix stays usable
+    Action VARCHAR(32) NOT NULL,                  -- create, edit, move_in, move_out, review_create, review_edit, review_delete
+    ChangedBy BIGINT NULL,                        -- Discord user ID (NULL if unknown)
+    BeforeData JSON NULL,
+    AfterData JSON NULL,
+    ChangedAt DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+
+    -- /stallhistory seeks on this index, newest first (AuditID breaks ties)
+    INDEX idx_audit_stall (TableName, StallNumber, StreetName, ChangedAt)
+);
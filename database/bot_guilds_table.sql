@@ -0,0 +1,9 @@
+-- Guilds the bot syncs its slash commands to, in addition to BTG_ID / FURRYVILLE_ID / GUILD_IDS
+-- Read once at startup when GUILDS_FROM_DB is enabled
+
+CREATE TABLE IF NOT EXISTS bot_guilds (
+    GuildID BIGINT PRIMARY KEY,
+    Name VARCHAR(100) NULL,                       -- For humans reading the table, unused by the bot
+    Enabled BOOLEAN NOT NULL DEFAULT TRUE,
+    AddedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+);
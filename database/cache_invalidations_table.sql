@@ -0,0 +1,13 @@
+-- Cache invalidations shared between bot processes (utils/invalidation.py)
+-- Writers insert in the same transaction as their change; every process polls for rows after its cursor
+-- Only needed with INVALIDATION_BACKEND=database. Rows older than a day are pruned by the pollers
+
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    InvalidationID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    Topic VARCHAR(32) NOT NULL,                   -- e.g. stall
+    CacheKey VARCHAR(512) NOT NULL,               -- JSON array, e.g. ["the_mall", "12.50", "Five"]
+    Source VARCHAR(64) NOT NULL,                  -- Instance that made the change (skips its own rows)
+    CreatedAt DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+
+    INDEX idx_created_at (CreatedAt)
+);
@@ -0,0 +1,18 @@
+-- Per-stall review aggregates for The Mall, kept up to date incrementally by the bot
+-- Every review insert, edit and delete adjusts the matching row in the same transaction
+
+CREATE TABLE IF NOT EXISTS the_mall_review_stats (
+    StallNumber INT NOT NULL,                     -- Same type as the_mall_reviews.StallNumber
+    StreetName VARCHAR(255) NOT NULL,
+    ReviewCount INT NOT NULL DEFAULT 0,
+    RatingTotal INT NOT NULL DEFAULT 0,           -- Sum of ratings; average = RatingTotal / ReviewCount
+
+    PRIMARY KEY (StallNumber, StreetName)
+);
+
+-- Backfill from existing reviews (safe to re-run)
+INSERT INTO the_mall_review_stats (StallNumber, StreetName, ReviewCount, RatingTotal)
+SELECT StallNumber, StreetName, COUNT(*), SUM(Rating)
+FROM the_mall_reviews
+GROUP BY StallNumber, StreetName
+ON DUPLICATE KEY UPDATE ReviewCount = VALUES(ReviewCount), RatingTotal = VALUES(RatingTotal);
@@ -0,0 +1,30 @@
+-- Row versions for the stall tables, so caches and replicas can fetch only what changed (utils/change_feed.py)
+-- Every insert and update done by the bot sets RowVersion = NEXT VALUE FOR stall_row_version
+
+CREATE SEQUENCE IF NOT EXISTS stall_row_version;
+
+ALTER TABLE warp_hall
+    ADD COLUMN IF NOT EXISTS RowVersion BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS UpdatedAt DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX IF NOT EXISTS idx_row_version (RowVersion);
+
+ALTER TABLE the_mall
+    ADD COLUMN IF NOT EXISTS RowVersion BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS UpdatedAt DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX IF NOT EXISTS idx_row_version (RowVersion);
+
+-- Give existing rows a version (safe to re-run, only touches rows that never got one)
+UPDATE warp_hall SET RowVersion = NEXT VALUE FOR stall_row_version WHERE RowVersion = 0;
+UPDATE the_mall SET RowVersion = NEXT VALUE FOR stall_row_version WHERE RowVersion = 0;
+
+-- Keys that stopped existing (e.g. the old key of a /stallmove), versioned from the same sequence
+-- Rows older than any consumer's cursor can be deleted; a consumer starting from 0 doesn't need them
+CREATE TABLE IF NOT EXISTS stall_tombstones (
+    TableName VARCHAR(32) NOT NULL,
+    StallNumber DECIMAL(10, 2) NOT NULL,
+    StreetName VARCHAR(255) NOT NULL DEFAULT '',
+    RowVersion BIGINT NOT NULL PRIMARY KEY,
+    RemovedAt DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+
+    INDEX idx_tombstone_table (TableName, RowVersion)
+);
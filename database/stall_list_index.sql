@@ -0,0 +1,4 @@
+-- Lets /stalllist seek through The Mall by street, then stall number, without sorting
+-- (warp_hall pages use its primary key)
+
+CREATE INDEX IF NOT EXISTS idx_street_stall ON the_mall (StreetName, StallNumber);
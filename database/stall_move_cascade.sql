@@ -0,0 +1,55 @@
+-- Let the database fan out The Mall stall renumbers/moves to the rows that reference the stall
+-- Needed by /stallmove. Without it the bot rewrites the child rows itself in the same transaction
+
+-- Foreign key columns must have the same type as the_mall's key. the_mall_reviews.StallNumber was
+-- created as INT even though Mall stall numbers can be fractional, so give both child tables
+-- whatever type the_mall.StallNumber has now (DECIMAL(10, 2) once stall_number_decimal.sql is applied)
+SET @stall_number_type = (
+    SELECT COLUMN_TYPE FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'the_mall' AND COLUMN_NAME = 'StallNumber'
+);
+
+SET @alter_reviews = CONCAT('ALTER TABLE the_mall_reviews MODIFY StallNumber ', @stall_number_type, ' NOT NULL');
+PREPARE alter_reviews FROM @alter_reviews;
+EXECUTE alter_reviews;
+DEALLOCATE PREPARE alter_reviews;
+
+SET @alter_stats = CONCAT('ALTER TABLE the_mall_review_stats MODIFY StallNumber ', @stall_number_type, ' NOT NULL');
+PREPARE alter_stats FROM @alter_stats;
+EXECUTE alter_stats;
+DEALLOCATE PREPARE alter_stats;
+
+-- The constraints can't be added while reviews point at stalls that no longer exist. Those reviews
+-- are listed here, then moved to the_mall_reviews_orphaned rather than deleted outright, so they
+-- can be checked and re-pointed at the right stall (or dropped) by hand afterwards
+SELECT r.ReviewID, r.StallNumber, r.StreetName, r.ReviewerID, r.ReviewerName, r.Rating
+FROM the_mall_reviews r
+LEFT JOIN the_mall m ON m.StallNumber = r.StallNumber AND m.StreetName = r.StreetName
+WHERE m.StallNumber IS NULL;
+
+CREATE TABLE IF NOT EXISTS the_mall_reviews_orphaned LIKE the_mall_reviews;
+
+INSERT INTO the_mall_reviews_orphaned
+SELECT r.* FROM the_mall_reviews r
+LEFT JOIN the_mall m ON m.StallNumber = r.StallNumber AND m.StreetName = r.StreetName
+WHERE m.StallNumber IS NULL;
+
+-- Only rows that made it into the archive are removed
+DELETE r FROM the_mall_reviews r
+JOIN the_mall_reviews_orphaned o ON o.ReviewID = r.ReviewID;
+
+-- Review stats are totals of the reviews above, so an orphaned stall's row holds nothing that
+-- isn't in the archive (review_stats_table.sql rebuilds it if the reviews are restored)
+DELETE s FROM the_mall_review_stats s
+LEFT JOIN the_mall m ON m.StallNumber = s.StallNumber AND m.StreetName = s.StreetName
+WHERE m.StallNumber IS NULL;
+
+ALTER TABLE the_mall_reviews
+    ADD CONSTRAINT fk_reviews_stall FOREIGN KEY (StallNumber, StreetName)
+    REFERENCES the_mall (StallNumber, StreetName)
+    ON UPDATE CASCADE ON DELETE RESTRICT;
+
+ALTER TABLE the_mall_review_stats
+    ADD CONSTRAINT fk_review_stats_stall FOREIGN KEY (StallNumber, StreetName)
+    REFERENCES the_mall (StallNumber, StreetName)
+    ON UPDATE CASCADE ON DELETE CASCADE;
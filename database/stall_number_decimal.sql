@@ -0,0 +1,24 @@
+-- Store The Mall stall numbers as exact DECIMAL(10, 2) instead of DOUBLE/INT
+-- Matches utils/stall_number.py: 2.1 is stored, compared and indexed as exactly 2.10
+
+-- Check first that no stall needs more than two decimal places (this should return no rows)
+-- SELECT StallNumber, StreetName FROM the_mall WHERE StallNumber <> ROUND(StallNumber, 2);
+
+-- Foreign keys from stall_move_cascade.sql pin the column types, so lift them while converting
+ALTER TABLE the_mall_reviews DROP FOREIGN KEY IF EXISTS fk_reviews_stall;
+ALTER TABLE the_mall_review_stats DROP FOREIGN KEY IF EXISTS fk_review_stats_stall;
+
+ALTER TABLE the_mall MODIFY StallNumber DECIMAL(10, 2) NOT NULL;
+ALTER TABLE the_mall_reviews MODIFY StallNumber DECIMAL(10, 2) NOT NULL;
+ALTER TABLE the_mall_review_stats MODIFY StallNumber DECIMAL(10, 2) NOT NULL;
+ALTER TABLE stall_audit_log MODIFY StallNumber DECIMAL(10, 2) NOT NULL;
+
+ALTER TABLE the_mall_reviews
+    ADD CONSTRAINT fk_reviews_stall FOREIGN KEY (StallNumber, StreetName)
+    REFERENCES the_mall (StallNumber, StreetName)
+    ON UPDATE CASCADE ON DELETE RESTRICT;
+
+ALTER TABLE the_mall_review_stats
+    ADD CONSTRAINT fk_review_stats_stall FOREIGN KEY (StallNumber, StreetName)
+    REFERENCES the_mall (StallNumber, StreetName)
+    ON UPDATE CASCADE ON DELETE CASCADE;
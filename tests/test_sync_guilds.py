@@ -0,0 +1,50 @@
+# Command sync should run up to sync_concurrency guilds at once, and never more
+
+import asyncio
+from types import SimpleNamespace
+
+from bot import FviClient
+
+
+class CountingTree:
+    """Stands in for the command tree, recording how many guild syncs overlap"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.synced = []
+
+    def copy_global_to(self, guild):
+        pass
+
+    async def sync(self, guild=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        # Yield a few times so every sync the semaphore lets through gets to start before any finishes
+        for _ in range(3):
+            await asyncio.sleep(0)
+        self.in_flight -= 1
+        self.synced.append(guild.id)
+
+
+def run_sync(guild_count: int, sync_concurrency: int) -> CountingTree:
+    tree = CountingTree()
+    client = SimpleNamespace(config=SimpleNamespace(sync_concurrency=sync_concurrency), tree=tree)
+    asyncio.run(FviClient.sync_guilds(client, list(range(1, guild_count + 1))))
+    return tree
+
+
+def test_sync_fills_but_never_exceeds_concurrency():
+    tree = run_sync(64, sync_concurrency=8)
+    assert tree.peak == 8
+    assert sorted(tree.synced) == list(range(1, 65))
+
+
+def test_sync_with_fewer_guilds_than_slots():
+    tree = run_sync(3, sync_concurrency=8)
+    assert tree.peak == 3
+    assert len(tree.synced) == 3
+
+
+def test_sync_one_at_a_time():
+    assert run_sync(8, sync_concurrency=1).peak == 1
@@ -0,0 +1,53 @@
+# Append-only audit log writes (see database/audit_log_table.sql)
+
+import json
+
+AUDIT_INSERT = (
+    "INSERT INTO stall_audit_log (TableName, StallNumber, StreetName, Action, ChangedBy, BeforeData, AfterData) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+def _to_json(data):
+    return None if data is None else json.dumps(data, default=str)
+
+
+def audit_row(table_name: str, stall_number, street_name, action: str, changed_by=None, before=None, after=None) -> tuple:
+    return (table_name, stall_number, street_name or "", action, changed_by, _to_json(before), _to_json(after))
+
+
+def record_change(cursor, table_name: str, stall_number, street_name, action: str, changed_by=None, before=None, after=None):
+    """Append one audit row inside the caller's transaction"""
+    cursor.execute(AUDIT_INSERT, audit_row(table_name, stall_number, street_name, action, changed_by, before, after))
+
+
+def record_changes(cursor, rows):
+    """Append many audit rows (built with audit_row) in one round trip"""
+    if rows:
+        cursor.executemany(AUDIT_INSERT, rows)
+
+
+# Actions that note something about a row rather than change it, with the label to show them under
+NOTE_ACTIONS = {
+    "review_flagged": "Flagged as a near-duplicate",
+}
+
+
+def describe_change(before, after, action: str = None) -> str:
+    """Short human readable summary of what changed between two JSON snapshots"""
+    before = json.loads(before) if isinstance(before, str) else (before or {})
+    after = json.loads(after) if isinstance(after, str) else (after or {})
+
+    if action in NOTE_ACTIONS:
+        return f"{NOTE_ACTIONS[action]}: " + ", ".join(f"{key}: {value}" for key, value in after.items())
+    if not before:
+        return "Created: " + ", ".join(f"{key}: {value}" for key, value in after.items())
+    if not after:
+        return "Deleted: " + ", ".join(f"{key}: {value}" for key, value in before.items())
+
+    changes = [
+        f"**{key}**: {before.get(key)} → {after.get(key)}"
+        for key in dict.fromkeys([*before, *after])
+        if before.get(key) != after.get(key)
+    ]
+    return "\n".join(changes) or "No visible changes"
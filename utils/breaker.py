@@ -0,0 +1,67 @@
+# Circuit breaker so a database outage fails commands fast instead of waiting out connect timeouts
+
+import math
+import threading
+import time
+import pymysql as mariadb
+
+
+class CircuitOpenError(mariadb.OperationalError):
+    """Raised instead of attempting a call while the breaker is open. A MariaDB error, so existing handlers catch it"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Database unavailable, retrying in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures, then lets one probe through every reset_timeout
+
+    closed: calls go through, failures are counted
+    open: calls fail immediately until reset_timeout has passed
+    half-open: a single probe call is allowed; success closes the breaker, failure re-opens it
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()  # Used from worker threads
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self, claim_probe: bool = True):
+        """Raise CircuitOpenError unless a call may go through now. With claim_probe=False, only check"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._probing:
+                raise CircuitOpenError(max(0.0, self.reset_timeout - waited))
+            if claim_probe:
+                self._probing = True  # This caller is the half-open probe and must report back
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print("✅ Database reachable again, closing circuit breaker.")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    print(f"⚠️ {self._failures} database failures in a row, opening circuit breaker.")
+                self._opened_at = time.monotonic()
+            self._probing = False
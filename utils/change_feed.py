@@ -0,0 +1,137 @@
+# Incremental change feed over the stall tables (see database/stall_change_feed.sql)
+
+import time
+
+from utils.stall_card import STALL_FIELDS
+
+NEXT_ROW_VERSION = "NEXT VALUE FOR stall_row_version"
+
+FEED_BATCH = 500
+
+# Versions are handed out when a statement runs but become visible at commit, so a slow transaction
+# can commit a lower version after a reader has moved past it. Only reading rows that have been
+# stable for a moment closes that gap for the bot's short write transactions
+SETTLE_SECONDS = 1.0
+
+# Anything slower is caught by re-reading what changed this recently below the cursor
+LATE_COMMIT_SECONDS = 300.0
+
+
+def record_tombstone(cursor, table_name: str, stall_number, street_name=None):
+    """Note that a stall key no longer exists, inside the caller's transaction"""
+    cursor.execute(
+        f"INSERT INTO stall_tombstones (TableName, StallNumber, StreetName, RowVersion) VALUES (%s, %s, %s, {NEXT_ROW_VERSION})",
+        (table_name, stall_number, street_name or "")
+    )
+
+
+def _removal(table_name: str, stall_number, street_name, version: int) -> dict:
+    key = {"StallNumber": stall_number}
+    if table_name == "the_mall":
+        key["StreetName"] = street_name
+    return {"version": version, "deleted": True, "row": key}
+
+
+def read_changes(cursor, table_name: str, since: int, limit: int = FEED_BATCH) -> dict:
+    """Rows changed and keys removed after version `since`, oldest first
+
+    Returns {"changes": [...], "cursor": int, "more": bool}. Each change is
+    {"version": int, "deleted": bool, "row": dict}; deleted rows only carry the key columns.
+    Pass the returned cursor back in to continue. Starting from 0 walks the whole table.
+    """
+    columns = [column for _, column, _ in STALL_FIELDS[table_name]]
+    cursor.execute(
+        f"SELECT {', '.join(columns)}, RowVersion FROM {table_name} "
+        "WHERE RowVersion > %s AND UpdatedAt < NOW(6) - INTERVAL %s SECOND "
+        "ORDER BY RowVersion LIMIT %s",
+        (since, SETTLE_SECONDS, limit)
+    )
+    updated = [
+        {"version": row[-1], "deleted": False, "row": dict(zip(columns, row[:-1]))}
+        for row in cursor.fetchall()
+    ]
+
+    cursor.execute(
+        "SELECT StallNumber, StreetName, RowVersion FROM stall_tombstones "
+        "WHERE TableName = %s AND RowVersion > %s AND RemovedAt < NOW(6) - INTERVAL %s SECOND "
+        "ORDER BY RowVersion LIMIT %s",
+        (table_name, since, SETTLE_SECONDS, limit)
+    )
+    removed = [_removal(table_name, *row) for row in cursor.fetchall()]
+
+    # A query that hit the limit may have more rows past its last version, so only hand out
+    # the prefix that both queries fully cover
+    full = [part[-1]["version"] for part in (updated, removed) if len(part) == limit]
+    changes = sorted(updated + removed, key=lambda change: change["version"])
+    if full:
+        changes = [change for change in changes if change["version"] <= min(full)]
+    return {
+        "changes": changes,
+        "cursor": changes[-1]["version"] if changes else since,
+        "more": bool(full)
+    }
+
+
+def read_late_changes(cursor, table_name: str, up_to: int, window: float = LATE_COMMIT_SECONDS) -> list:
+    """Rows changed and keys removed at or below version `up_to` within the last window seconds
+
+    A transaction that commits more than SETTLE_SECONDS after its statement ran lands below a
+    cursor that has already moved on; this finds it again. Includes changes already delivered,
+    so callers filter by version.
+    """
+    columns = [column for _, column, _ in STALL_FIELDS[table_name]]
+    cursor.execute(
+        f"SELECT {', '.join(columns)}, RowVersion FROM {table_name} "
+        "WHERE RowVersion <= %s AND UpdatedAt >= NOW(6) - INTERVAL %s SECOND",
+        (up_to, window)
+    )
+    changes = [
+        {"version": row[-1], "deleted": False, "row": dict(zip(columns, row[:-1]))}
+        for row in cursor.fetchall()
+    ]
+    cursor.execute(
+        "SELECT StallNumber, StreetName, RowVersion FROM stall_tombstones "
+        "WHERE TableName = %s AND RowVersion <= %s AND RemovedAt >= NOW(6) - INTERVAL %s SECOND",
+        (table_name, up_to, window)
+    )
+    changes += [_removal(table_name, *row) for row in cursor.fetchall()]
+    return sorted(changes, key=lambda change: change["version"])
+
+
+class ChangeFeed:
+    """Follows one stall table from a cursor. poll() returns only what changed since the last call"""
+
+    def __init__(self, pool, table_name: str, cursor: int = 0):
+        self.pool = pool
+        self.table_name = table_name
+        self.cursor = cursor
+        self._delivered = {}  # Version -> monotonic time handed out, for the late commit window
+
+    def poll(self) -> list:
+        """Fetch every settled change after the cursor, plus late commits below it, and advance it (blocking, run in a worker thread)"""
+        conn = self.pool.get_connection(read_only=True)
+        try:
+            db_cursor = conn.cursor()
+            changes = []
+            if self.cursor:
+                changes += [
+                    change for change in read_late_changes(db_cursor, self.table_name, self.cursor)
+                    if change["version"] not in self._delivered
+                ]
+            while True:
+                batch = read_changes(db_cursor, self.table_name, self.cursor)
+                changes.extend(batch["changes"])
+                self.cursor = batch["cursor"]
+                if not batch["more"]:
+                    break
+            db_cursor.close()
+
+            now = time.monotonic()
+            self._delivered = {
+                version: at for version, at in self._delivered.items() if now - at < LATE_COMMIT_SECONDS + SETTLE_SECONDS
+            }
+            for change in changes:
+                self._delivered[change["version"]] = now
+            return changes
+        finally:
+            conn.close()
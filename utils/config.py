@@ -0,0 +1,211 @@
+# Typed bot configuration, read from the environment once at startup
+
+import os
+import socket
+from dataclasses import dataclass, field
+
+
+# (command class, scope) -> (requests, per seconds). Override with e.g. RATE_LIMIT_LOOKUP_USER=5/10
+DEFAULT_RATE_LIMITS = {
+    ("lookup", "user"): (5, 10.0),
+    ("lookup", "guild"): (60, 10.0),
+    ("review", "user"): (3, 30.0),
+    ("review", "guild"): (30, 30.0),
+    ("write", "user"): (5, 30.0),
+    ("write", "guild"): (30, 30.0),
+}
+
+
+class ConfigError(Exception):
+    """Raised when required settings are missing or malformed"""
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    """Immutable settings shared by the bot and every cog"""
+
+    token: str = field(repr=False)
+    owner_id: int
+    bot_role_ids: frozenset
+    guild_ids: tuple
+
+    # Database
+    db_user: str
+    db_password: str = field(repr=False)
+    db_host: str = "furryville-index.db"
+    db_name: str = "furryville"
+    db_pool_size: int = 5
+    db_acquire_timeout: float = 5.0
+    db_connect_timeout: float = 5.0
+    db_breaker_threshold: int = 5
+    db_breaker_reset: float = 15.0
+    db_read_retries: int = 2
+    db_retry_delay: float = 0.1
+    db_replica_hosts: tuple = ()  # host or host:port for each read replica
+    read_your_writes: float = 10.0
+
+    # Caches and timeouts
+    stall_card_cache_size: int = 2048
+    drain_deadline: float = 30.0
+    sync_concurrency: int = 8
+    snapshot_path: str = "data/offline_snapshot.sqlite3"
+    snapshot_interval: float = 300.0
+    invalidation_poll_interval: float = 2.0
+    stall_directory_interval: float = 5.0
+    fast_response_budget: float = 0.5  # Lookups finishing within this answer without a defer
+
+    # Feature flags and tuning for the performance features
+    rate_limit_enabled: bool = True
+    rate_limits: dict = field(default_factory=lambda: dict(DEFAULT_RATE_LIMITS))
+    review_duplicate_action: str = "flag"  # off, flag (log only) or reject
+    review_duplicate_distance: int = 5
+    review_duplicate_min_words: int = 8
+    review_index_capacity: int = 50000
+    snapshot_enabled: bool = True
+    stall_directory_enabled: bool = True
+    auto_shard: bool = False
+    shard_count: int = None  # None lets Discord recommend a count
+    guilds_from_db: bool = False  # Also sync to every enabled guild in the bot_guilds table
+    invalidation_backend: str = "local"  # local (single process) or database (several processes)
+    instance_id: str = field(default_factory=lambda: f"{socket.gethostname()}:{os.getpid()}")
+
+    @classmethod
+    def from_env(cls) -> "BotConfig":
+        """Build the config from environment variables, reporting every problem at once"""
+        errors = []
+
+        def required(name):
+            value = os.getenv(name)
+            if not value:
+                errors.append(f"{name} is not set")
+            return value
+
+        def as_int(name, default=None):
+            value = os.getenv(name)
+            if not value:
+                if default is None:
+                    errors.append(f"{name} is not set")
+                return default
+            try:
+                return int(value)
+            except ValueError:
+                errors.append(f"{name} must be an integer, got {value!r}")
+                return default
+
+        def as_float(name, default):
+            value = os.getenv(name)
+            if not value:
+                return default
+            try:
+                return float(value)
+            except ValueError:
+                errors.append(f"{name} must be a number, got {value!r}")
+                return default
+
+        def as_bool(name, default):
+            value = os.getenv(name)
+            if not value:
+                return default
+            if value.lower() in ("1", "true", "yes", "on"):
+                return True
+            if value.lower() in ("0", "false", "no", "off"):
+                return False
+            errors.append(f"{name} must be true or false, got {value!r}")
+            return default
+
+        def as_rate_limits():
+            limits = {}
+            for (command_class, scope), default in DEFAULT_RATE_LIMITS.items():
+                name = f"RATE_LIMIT_{command_class.upper()}_{scope.upper()}"
+                value = os.getenv(name)
+                if not value:
+                    limits[(command_class, scope)] = default
+                    continue
+                try:
+                    count, per = value.split("/")
+                    limits[(command_class, scope)] = (int(count), float(per))
+                except ValueError:
+                    errors.append(f"{name} must look like COUNT/SECONDS, got {value!r}")
+                    limits[(command_class, scope)] = default
+            return limits
+
+        def as_id_list(name):
+            ids = []
+            for part in os.getenv(name, "").split(","):
+                if not part.strip():
+                    continue
+                try:
+                    ids.append(int(part))
+                except ValueError:
+                    errors.append(f"{name} contains a non-integer ID: {part.strip()!r}")
+            return ids
+
+        config = cls(
+            token=required("DISCORD_TOKEN"),
+            owner_id=as_int("POSTMAN_ID"),
+            bot_role_ids=frozenset(as_id_list("BOTROLE_ID")),
+            guild_ids=tuple(dict.fromkeys(as_id_list("BTG_ID") + as_id_list("FURRYVILLE_ID") + as_id_list("GUILD_IDS"))),
+            db_user=required("DB_USER"),
+            db_password=os.getenv("DB_PASSWORD", ""),
+            db_host=os.getenv("DB_HOST", cls.db_host),
+            db_name=os.getenv("DB_NAME", cls.db_name),
+            db_pool_size=as_int("DB_POOL_SIZE", cls.db_pool_size),
+            db_acquire_timeout=as_float("DB_ACQUIRE_TIMEOUT", cls.db_acquire_timeout),
+            db_connect_timeout=as_float("DB_CONNECT_TIMEOUT", cls.db_connect_timeout),
+            db_breaker_threshold=as_int("DB_BREAKER_THRESHOLD", cls.db_breaker_threshold),
+            db_breaker_reset=as_float("DB_BREAKER_RESET", cls.db_breaker_reset),
+            db_read_retries=as_int("DB_READ_RETRIES", cls.db_read_retries),
+            db_retry_delay=as_float("DB_RETRY_DELAY", cls.db_retry_delay),
+            db_replica_hosts=tuple(host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()),
+            read_your_writes=as_float("READ_YOUR_WRITES", cls.read_your_writes),
+            stall_card_cache_size=as_int("STALL_CARD_CACHE_SIZE", cls.stall_card_cache_size),
+            drain_deadline=as_float("DRAIN_DEADLINE", cls.drain_deadline),
+            sync_concurrency=as_int("SYNC_CONCURRENCY", cls.sync_concurrency),
+            snapshot_path=os.getenv("SNAPSHOT_PATH", cls.snapshot_path),
+            snapshot_interval=as_float("SNAPSHOT_INTERVAL", cls.snapshot_interval),
+            invalidation_poll_interval=as_float("INVALIDATION_POLL_INTERVAL", cls.invalidation_poll_interval),
+            stall_directory_interval=as_float("STALL_DIRECTORY_INTERVAL", cls.stall_directory_interval),
+            fast_response_budget=as_float("FAST_RESPONSE_BUDGET", cls.fast_response_budget),
+            rate_limit_enabled=as_bool("RATE_LIMIT_ENABLED", cls.rate_limit_enabled),
+            rate_limits=as_rate_limits(),
+            review_duplicate_action=os.getenv("REVIEW_DUPLICATE_ACTION", cls.review_duplicate_action).lower(),
+            review_duplicate_distance=as_int("REVIEW_DUPLICATE_DISTANCE", cls.review_duplicate_distance),
+            review_duplicate_min_words=as_int("REVIEW_DUPLICATE_MIN_WORDS", cls.review_duplicate_min_words),
+            review_index_capacity=as_int("REVIEW_INDEX_CAPACITY", cls.review_index_capacity),
+            snapshot_enabled=as_bool("SNAPSHOT_ENABLED", cls.snapshot_enabled),
+            stall_directory_enabled=as_bool("STALL_DIRECTORY_ENABLED", cls.stall_directory_enabled),
+            auto_shard=as_bool("AUTO_SHARD", cls.auto_shard),
+            shard_count=as_int("SHARD_COUNT", 0) or None,
+            guilds_from_db=as_bool("GUILDS_FROM_DB", cls.guilds_from_db),
+            invalidation_backend=os.getenv("INVALIDATION_BACKEND", cls.invalidation_backend).lower(),
+            instance_id=os.getenv("INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}",
+        )
+
+        if not config.guild_ids and not config.guilds_from_db:
+            errors.append("Set at least one of BTG_ID, FURRYVILLE_ID or GUILD_IDS, or enable GUILDS_FROM_DB")
+        for host in config.db_replica_hosts:
+            port = host.partition(":")[2]
+            if port and not port.isdigit():
+                errors.append(f"DB_REPLICA_HOSTS entry {host!r} has a non-numeric port")
+        if config.sync_concurrency is not None and config.sync_concurrency <= 0:
+            errors.append("SYNC_CONCURRENCY must be positive")
+        if config.db_pool_size is not None and config.db_pool_size <= 0:
+            errors.append("DB_POOL_SIZE must be positive")
+        if config.db_breaker_threshold <= 0:
+            errors.append("DB_BREAKER_THRESHOLD must be positive")
+        if config.db_read_retries < 0:
+            errors.append("DB_READ_RETRIES can't be negative")
+        if config.snapshot_interval <= 0:
+            errors.append("SNAPSHOT_INTERVAL must be positive")
+        if config.stall_directory_interval <= 0:
+            errors.append("STALL_DIRECTORY_INTERVAL must be positive")
+        if not 0 <= config.fast_response_budget <= 2:
+            errors.append("FAST_RESPONSE_BUDGET must be between 0 and 2 seconds, well inside Discord's 3 second window")
+        if config.invalidation_backend not in ("local", "database"):
+            errors.append("INVALIDATION_BACKEND must be local or database")
+        if config.review_duplicate_action not in ("off", "flag", "reject"):
+            errors.append("REVIEW_DUPLICATE_ACTION must be off, flag or reject")
+
+        if errors:
+            raise ConfigError("Invalid configuration:\n- " + "\n- ".join(errors))
+        return config
@@ -0,0 +1,187 @@
+# Shared database connection pool. Lives on the bot object so it survives cog reloads
+
+import random
+import threading
+import time
+import pymysql as mariadb
+
+from utils.breaker import CircuitBreaker, CircuitOpenError
+
+
+class PooledConnection:
+    """Thin proxy around a pooled connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        """Return the connection to the pool instead of closing the socket"""
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+
+class ConnectionPool:
+    """Small thread-safe pool of MariaDB connections"""
+
+    def __init__(
+        self,
+        max_size: int = 5,
+        acquire_timeout: float = 5.0,
+        ping_after: float = 30.0,
+        breaker: CircuitBreaker = None,
+        read_retries: int = 2,
+        retry_delay: float = 0.1,
+        **connect_kwargs
+    ):
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.ping_after = ping_after  # Only ping connections that sat idle longer than this
+        self.breaker = breaker or CircuitBreaker()
+        self.read_retries = read_retries
+        self.retry_delay = retry_delay
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = []  # (connection, returned_at) pairs, used LIFO to keep hot sockets hot
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def get_connection(self, read_only: bool = False) -> PooledConnection:
+        """Check out a connection, opening a new one if none are idle
+
+        Fails immediately while the circuit breaker is open. With read_only=True, failed connects are
+        retried with jittered backoff; only pass it from worker threads, since retries sleep.
+        """
+        if self._closed:
+            raise mariadb.OperationalError("Connection pool is closed")
+        self.breaker.before_call(claim_probe=False)  # Don't queue for a slot during an outage
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise mariadb.OperationalError("Timed out waiting for a pooled database connection")
+
+        try:
+            self.breaker.before_call()
+            conn = None
+            with self._lock:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+            # After an outage, don't trust an idle connection without checking it
+            if conn is None or self.breaker.state != "closed" or time.monotonic() - returned_at > self.ping_after:
+                conn = self._connect(conn, self.read_retries if read_only else 0)
+            return PooledConnection(self, conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _connect(self, conn, retries: int):
+        """Open (or ping) a connection, feeding the outcome to the circuit breaker"""
+        attempt = 0
+        while True:
+            try:
+                if conn is None:
+                    conn = mariadb.connect(**self.connect_kwargs)
+                else:
+                    conn.ping(reconnect=True)
+                self.breaker.record_success()
+                return conn
+            except mariadb.Error:
+                self.breaker.record_failure()
+                if attempt >= retries:
+                    raise
+                # Full jitter, so callers retrying together don't hit a recovering server in lockstep
+                time.sleep(random.uniform(0, self.retry_delay * 2 ** attempt))
+                attempt += 1
+                self.breaker.before_call()
+
+    def release(self, conn):
+        """Put a connection back, ending any transaction it left open"""
+        try:
+            if self._closed:
+                conn.close()
+                return
+            # A transaction left open would pin a stale snapshot for the next borrower
+            conn.rollback()
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        except mariadb.Error:
+            try:
+                conn.close()
+            except mariadb.Error:
+                pass
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections; checked-out ones are closed when released"""
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except mariadb.Error:
+                pass
+
+
+class DatabaseRouter:
+    """Sends writes to the primary and replica-safe reads to replicas
+
+    A user's reads go to the primary for read_your_writes seconds after their own write, so they
+    always see what they just changed even if the replicas lag behind.
+    """
+
+    def __init__(self, primary: ConnectionPool, replicas=(), read_your_writes: float = 10.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.read_your_writes = read_your_writes
+        self._recent_writers = {}  # user ID -> monotonic time of their last write
+        self._next_replica = 0
+        self._lock = threading.Lock()
+
+    def record_write(self, user_id):
+        """Pin the user's reads to the primary for the read-your-writes window"""
+        if user_id is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writers[user_id] = now
+            # Drop expired entries now and then so the map stays about as big as the active writer count
+            if len(self._recent_writers) > 1024:
+                self._recent_writers = {
+                    user: at for user, at in self._recent_writers.items() if now - at < self.read_your_writes
+                }
+
+    def recently_wrote(self, user_id=None) -> bool:
+        """Whether the user wrote within the read-your-writes window"""
+        wrote_at = self._recent_writers.get(user_id)
+        return wrote_at is not None and time.monotonic() - wrote_at < self.read_your_writes
+
+    def replica_ok(self, user_id=None) -> bool:
+        """Whether a read for this user may be served by a replica"""
+        return bool(self.replicas) and not self.recently_wrote(user_id)
+
+    def get_connection(self, read_only: bool = False, replica: bool = False) -> PooledConnection:
+        """Primary connection, or a replica one (round robin) when replica=True and one is healthy"""
+        if replica and read_only and self.replicas:
+            with self._lock:
+                start = self._next_replica
+                self._next_replica = (start + 1) % len(self.replicas)
+            for offset in range(len(self.replicas)):
+                pool = self.replicas[(start + offset) % len(self.replicas)]
+                try:
+                    return pool.get_connection(read_only=True)
+                except CircuitOpenError:
+                    continue  # Already reported when its breaker opened
+                except mariadb.Error as e:
+                    print(f"Replica unavailable, trying the next one: {e}")
+            # Every replica is down; the primary can still serve the read
+        return self.primary.get_connection(read_only)
+
+    def close(self):
+        self.primary.close()
+        for pool in self.replicas:
+            pool.close()
@@ -0,0 +1,52 @@
+# Answer interactions in a single response when the lookup is quick, deferring only when it isn't
+
+import asyncio
+
+
+class ResponseStats:
+    """Per-command counts of lookups answered directly versus after a defer"""
+
+    def __init__(self):
+        self.counts = {}  # command -> [fast, deferred]
+
+    def record(self, command: str, fast: bool):
+        self.counts.setdefault(command, [0, 0])[0 if fast else 1] += 1
+
+    @property
+    def fast(self) -> int:
+        return sum(fast for fast, _ in self.counts.values())
+
+    @property
+    def total(self) -> int:
+        return sum(fast + deferred for fast, deferred in self.counts.values())
+
+    def summary(self) -> str:
+        if not self.total:
+            return "No lookups yet"
+        return f"{self.fast}/{self.total} answered without deferring ({self.fast / self.total:.0%})"
+
+
+async def within_budget(interaction, lookup, budget: float, stats: ResponseStats, command: str, ephemeral: bool = False):
+    """Await the lookup coroutine, deferring the interaction only if it runs past budget seconds
+
+    Cache hits finish before the budget, so the answer goes out as the one and only response
+    instead of a defer plus a followup. Reply afterwards with send(), which picks the right call.
+    """
+    task = asyncio.ensure_future(lookup)
+    try:
+        # Shielded so running out of budget only stops the waiting, not the lookup
+        result = await asyncio.wait_for(asyncio.shield(task), budget)
+        stats.record(command, True)
+    except asyncio.TimeoutError:
+        await interaction.response.defer(ephemeral=ephemeral)
+        result = await task
+        stats.record(command, False)
+    return result
+
+
+async def send(interaction, **kwargs):
+    """Reply with the initial response if it's still unused, otherwise with a followup"""
+    if interaction.response.is_done():
+        await interaction.followup.send(**kwargs)
+    else:
+        await interaction.response.send_message(**kwargs)
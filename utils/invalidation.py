@@ -0,0 +1,125 @@
+# Cache invalidation shared between bot processes (see database/cache_invalidations_table.sql)
+
+import json
+import threading
+from collections import deque
+
+from utils.change_feed import SETTLE_SECONDS
+
+INVALIDATION_BATCH = 500
+PRUNE_EVERY = 500  # Polls between deletes of day-old log rows
+
+
+class DatabaseInvalidationLog:
+    """Invalidations written to a MariaDB table in the writer's transaction and polled by every process"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._polls = 0
+
+    def record(self, cursor, topic: str, key: list, source: str):
+        cursor.execute(
+            "INSERT INTO cache_invalidations (Topic, CacheKey, Source) VALUES (%s, %s, %s)",
+            (topic, json.dumps(key, default=str), source)
+        )
+
+    def latest(self) -> int:
+        """Current end of the log; a process starting now has nothing cached that older rows could affect"""
+        conn = self.pool.get_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(InvalidationID), 0) FROM cache_invalidations")
+            latest = cursor.fetchone()[0]
+            cursor.close()
+            return latest
+        finally:
+            conn.close()
+
+    def read(self, since: int) -> list:
+        """(id, topic, key, source) rows after since, oldest first (blocking, run in a worker thread)"""
+        conn = self.pool.get_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            # Same settle window as the change feed, so a late commit with a lower ID isn't skipped
+            cursor.execute(
+                "SELECT InvalidationID, Topic, CacheKey, Source FROM cache_invalidations "
+                "WHERE InvalidationID > %s AND CreatedAt < NOW(6) - INTERVAL %s SECOND "
+                "ORDER BY InvalidationID LIMIT %s",
+                (since, SETTLE_SECONDS, INVALIDATION_BATCH)
+            )
+            rows = [(row_id, topic, json.loads(key), source) for row_id, topic, key, source in cursor.fetchall()]
+
+            self._polls += 1
+            if self._polls % PRUNE_EVERY == 0:
+                cursor.execute("DELETE FROM cache_invalidations WHERE CreatedAt < NOW() - INTERVAL 1 DAY LIMIT 5000")
+                conn.commit()
+
+            cursor.close()
+            return rows
+        finally:
+            conn.close()
+
+
+class LocalInvalidationLog:
+    """In-process stand-in for the database log, for single-process runs or several buses in one process
+
+    Not transactional: a record survives even if the writer's transaction rolls back, which only
+    costs an extra cache miss.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self._rows = deque(maxlen=max_size)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def record(self, cursor, topic: str, key: list, source: str):
+        with self._lock:
+            self._rows.append((self._next_id, topic, json.loads(json.dumps(key, default=str)), source))
+            self._next_id += 1
+
+    def latest(self) -> int:
+        with self._lock:
+            return self._next_id - 1
+
+    def read(self, since: int) -> list:
+        with self._lock:
+            return [row for row in self._rows if row[0] > since][:INVALIDATION_BATCH]
+
+
+class InvalidationBus:
+    """Fans cache invalidations out to local subscribers and, through the log, to other processes
+
+    Writers call broadcast() inside their transaction and deliver() after committing. Every
+    process runs poll() periodically to pick up other processes' invalidations.
+    """
+
+    def __init__(self, instance_id: str, log=None):
+        self.instance_id = instance_id
+        self.log = log if log is not None else LocalInvalidationLog()
+        self.cursor = None  # Log position, set on the first poll
+        self._subscribers = {}  # topic -> list of callbacks taking the key parts
+
+    def subscribe(self, topic: str, callback):
+        self._subscribers.setdefault(topic, []).append(callback)
+
+    def broadcast(self, cursor, topic: str, *key):
+        """Queue an invalidation for other processes, inside the caller's transaction"""
+        self.log.record(cursor, topic, list(key), self.instance_id)
+
+    def deliver(self, topic: str, *key):
+        """Drop the key from this process's caches"""
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(*key)
+            except Exception as e:
+                print(f"Error invalidating {topic} {key}: {e}")
+
+    def poll(self) -> list:
+        """Fetch invalidations from other processes since the last poll (blocking, run in a worker thread)"""
+        if self.cursor is None:
+            self.cursor = self.log.latest()
+            return []
+        rows = self.log.read(self.cursor)
+        if rows:
+            self.cursor = rows[-1][0]
+        return [(topic, key) for _, topic, key, source in rows if source != self.instance_id]
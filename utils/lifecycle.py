@@ -0,0 +1,46 @@
+# Tracks in-flight interactions so the bot can drain before shutting down
+
+import asyncio
+import contextlib
+
+
+class Lifecycle:
+    """In-flight interaction tracking and drain state for graceful restarts"""
+
+    def __init__(self):
+        self.draining = False
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def _start(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def _finish(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    @contextlib.asynccontextmanager
+    async def track(self):
+        """Count an interaction as in-flight for the duration of the block"""
+        self._start()
+        try:
+            yield
+        finally:
+            self._finish()
+
+    def track_task(self, task: asyncio.Task):
+        """Count a task (e.g. a button callback or modal submit) as in-flight until it finishes"""
+        self._start()
+        task.add_done_callback(lambda _: self._finish())
+
+    async def drain(self, deadline: float) -> bool:
+        """Stop accepting new work and wait for in-flight work. Returns False if the deadline hit"""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=deadline)
+            return True
+        except asyncio.TimeoutError:
+            return False
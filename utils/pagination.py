@@ -0,0 +1,61 @@
+# Short-lived cache of keyset-paginated pages, so the next page can be fetched before it's asked for
+
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class PageCache:
+    """In-flight or finished page fetches by (query, cursor) key, kept for ttl seconds
+
+    Entries hold the fetch task itself, so a click that arrives while its page is still being
+    prefetched waits for that fetch instead of starting another one.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._pages = OrderedDict()  # key -> (monotonic time, task)
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, key):
+        entry = self._pages.get(key)
+        if entry is None:
+            return None
+        fetched_at, task = entry
+        failed = task.done() and (task.cancelled() or task.exception() is not None)
+        if failed or time.monotonic() - fetched_at >= self.ttl:
+            del self._pages[key]
+            return None
+        return task
+
+    def _start(self, key, fetch, *args):
+        task = asyncio.ensure_future(fetch(*args))
+        self._pages[key] = (time.monotonic(), task)
+        while len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+        return task
+
+    async def get(self, key, fetch, *args):
+        """The page for key, from the cache or by awaiting fetch(*args)"""
+        task = self._fresh(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = self._start(key, fetch, *args)
+        return await asyncio.shield(task)
+
+    def prefetch(self, key, fetch, *args):
+        """Start fetching a page in the background unless it's already cached or on its way"""
+        if self._fresh(key) is None:
+            self._start(key, fetch, *args)
+
+    def discard(self, key):
+        """Forget one page, e.g. a failed fetch that shouldn't be served again"""
+        self._pages.pop(key, None)
+
+    def clear(self, *_):
+        """Forget every page; takes and ignores an invalidation key so it can subscribe to the bus"""
+        self._pages.clear()
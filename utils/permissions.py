@@ -0,0 +1,48 @@
+# Shared authorization checks for all cogs
+
+import discord
+from discord import app_commands
+
+
+class Authorizer:
+    """Resolves whether a user may run the bot's privileged commands"""
+
+    def __init__(self, owner_id: int, allowed_role_ids):
+        self.owner_id = owner_id
+        self.allowed_role_ids = frozenset(allowed_role_ids)
+
+    def is_owner(self, user_id: int) -> bool:
+        return user_id == self.owner_id
+
+    def is_authorized(self, user) -> bool:
+        """Owner, or any member holding one of the allowed roles"""
+        if user.id == self.owner_id:
+            return True
+
+        # Users outside a guild (DMs) have no roles
+        return any(role.id in self.allowed_role_ids for role in getattr(user, "roles", ()))
+
+
+def is_moderator(interaction: discord.Interaction) -> bool:
+    """Check whether the interaction user is the owner or holds a bot role"""
+    return interaction.client.authorizer.is_authorized(interaction.user)
+
+
+async def require_moderator(interaction: discord.Interaction) -> bool:
+    """Check the user is a moderator, sending a permission error if not"""
+    if is_moderator(interaction):
+        return True
+
+    # If no permissions, send error message
+    embed = discord.Embed(
+        title="❌ Permission Denied",
+        description="You don't have permission to use this bot's commands.",
+        color=0xe74c3c
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+    return False
+
+
+def has_bot_permissions():
+    """Check if user has the required role or is the bot owner"""
+    return app_commands.check(require_moderator)
@@ -0,0 +1,100 @@
+# In-memory token bucket rate limiting, applied before commands touch the database
+
+import math
+import time
+from collections import OrderedDict
+import discord
+from discord import app_commands
+
+
+class BucketGroup:
+    """Token buckets sharing one rate, kept in last-used order so idle ones can be evicted cheaply"""
+
+    def __init__(self, capacity: int, per: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / per  # Tokens per second
+        self.idle_after = per  # A bucket untouched this long is full again, so dropping it loses nothing
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+
+    def _evict_idle(self, now: float):
+        while self._buckets:
+            key, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at < self.idle_after:
+                break
+            del self._buckets[key]
+
+    def peek(self, key, now: float) -> float:
+        """Seconds until a token is available for key (0 if one is available now)"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.refill_rate
+
+    def take(self, key, now: float):
+        """Consume one token for key. Call peek() first"""
+        self._evict_idle(now)
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+        self._buckets[key] = [tokens - 1, now]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Per-user and per-guild token buckets for each command class"""
+
+    def __init__(self, limits: dict):
+        # limits: {(command_class, "user" | "guild"): (count, per_seconds)}
+        self._groups = {key: BucketGroup(count, per) for key, (count, per) in limits.items()}
+
+    def hit(self, command_class: str, user_id: int, guild_id=None) -> float:
+        """Try to spend a token for this user and guild. Returns 0 if allowed, else seconds to wait"""
+        now = time.monotonic()
+        checks = [(self._groups.get((command_class, "user")), user_id)]
+        if guild_id is not None:
+            checks.append((self._groups.get((command_class, "guild")), guild_id))
+        checks = [(group, key) for group, key in checks if group is not None]
+
+        # Only spend tokens when every bucket has one, so a guild-wide limit doesn't drain user buckets
+        retry_after = max((group.peek(key, now) for group, key in checks), default=0.0)
+        if retry_after > 0:
+            return retry_after
+
+        for group, key in checks:
+            group.take(key, now)
+        return 0.0
+
+
+async def check_rate_limit(interaction: discord.Interaction, command_class: str) -> bool:
+    """Spend a token for this interaction, telling the user to slow down if they're out"""
+    limiter = interaction.client.rate_limiter
+    if limiter is None:
+        return True
+
+    retry_after = limiter.hit(command_class, interaction.user.id, interaction.guild_id)
+    if retry_after <= 0:
+        return True
+
+    embed = discord.Embed(
+        title="⏳ Slow Down",
+        description=f"You're using this command too quickly. Try again in {math.ceil(retry_after)} seconds.",
+        color=0xe74c3c
+    )
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    return False
+
+
+def rate_limited(command_class: str):
+    """Check that rate limits the command under the given command class"""
+    async def predicate(interaction: discord.Interaction) -> bool:
+        return await check_rate_limit(interaction, command_class)
+
+    return app_commands.check(predicate)
@@ -0,0 +1,21 @@
+# Incremental maintenance of the_mall_review_stats (see database/review_stats_table.sql)
+
+
+def apply_review_delta(cursor, stall_number, street_name: str, count_delta: int, rating_delta: int):
+    """Adjust a stall's review count and rating total inside the caller's transaction"""
+    cursor.execute(
+        "INSERT INTO the_mall_review_stats (StallNumber, StreetName, ReviewCount, RatingTotal) VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE ReviewCount = ReviewCount + VALUES(ReviewCount), RatingTotal = RatingTotal + VALUES(RatingTotal)",
+        (stall_number, street_name, count_delta, rating_delta)
+    )
+
+
+def apply_deleted_reviews(cursor, rows):
+    """Subtract deleted reviews from their stalls' aggregates. rows are (StallNumber, StreetName, Rating)"""
+    deltas = {}
+    for stall_number, street_name, rating in rows:
+        count, total = deltas.get((stall_number, street_name), (0, 0))
+        deltas[(stall_number, street_name)] = (count + 1, total + rating)
+
+    for (stall_number, street_name), (count, total) in deltas.items():
+        apply_review_delta(cursor, stall_number, street_name, -count, -total)
@@ -0,0 +1,25 @@
+# Request coalescing: concurrent identical lookups share one in-flight call
+
+import asyncio
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key. Results are shared, so callers must not mutate them"""
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0  # How many callers piggybacked on another caller's in-flight call
+
+    async def do(self, key, func, *args):
+        """Await func(*args), or join the call already in flight for key"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(func(*args))
+            self._calls[key] = task
+            # Forget the call when it finishes, not when a caller stops waiting
+            task.add_done_callback(lambda t: self._calls.pop(key, None) if self._calls.get(key) is t else None)
+
+        # Shield so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
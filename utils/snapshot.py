@@ -0,0 +1,222 @@
+# Local read-only SQLite copy of stalls and reviews, served when MariaDB is unreachable
+
+import os
+import sqlite3
+import time
+from decimal import Decimal
+import discord
+import pymysql as mariadb
+
+from utils.stall_card import format_stall_number
+from utils.stall_number import parse_stall_number
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE warp_hall (StallNumber INTEGER PRIMARY KEY, IGN TEXT, StallName TEXT);
+CREATE TABLE the_mall (StallNumber TEXT, StreetName TEXT, IGN TEXT, StallName TEXT, ItemsSold TEXT, PRIMARY KEY (StallNumber, StreetName));
+CREATE TABLE the_mall_reviews (ReviewID INTEGER PRIMARY KEY, StallNumber TEXT, StreetName TEXT, ReviewerName TEXT, ReviewText TEXT, Rating INTEGER, UpdatedAt TEXT);
+CREATE INDEX idx_stall_street ON the_mall_reviews (StallNumber, StreetName, UpdatedAt);
+CREATE TABLE snapshot_meta (TakenAt REAL);
+"""
+
+# (source query, snapshot insert) per table, copied in this order
+SNAPSHOT_TABLES = [
+    ("SELECT StallNumber, IGN, StallName FROM warp_hall",
+     "INSERT INTO warp_hall VALUES (?, ?, ?)"),
+    ("SELECT StallNumber, StreetName, IGN, StallName, ItemsSold FROM the_mall",
+     "INSERT INTO the_mall VALUES (?, ?, ?, ?, ?)"),
+    ("SELECT ReviewID, StallNumber, StreetName, ReviewerName, ReviewText, Rating, UpdatedAt FROM the_mall_reviews",
+     "INSERT INTO the_mall_reviews VALUES (?, ?, ?, ?, ?, ?, ?)"),
+]
+
+COPY_BATCH = 1000
+
+
+def _snapshot_value(value):
+    """SQLite has no DECIMAL or DATETIME, so store canonical stall numbers and timestamps as sortable text"""
+    if isinstance(value, Decimal):
+        return str(parse_stall_number(value))
+    if hasattr(value, "isoformat"):
+        return str(value)
+    return value
+
+OFFLINE_WRITE_ERROR = "The database is offline, so changes can't be saved right now. Please try again later."
+
+
+class OfflineSnapshot:
+    """Periodically rebuilt SQLite file. Readers only ever see a complete snapshot, swapped in atomically"""
+
+    def __init__(self, path: str = None):
+        self.path = path  # None disables the fallback
+        self.taken_at = None  # Unix time of the snapshot on disk, None if there isn't one
+        if path and os.path.exists(path):
+            try:
+                self.taken_at = self._read(lambda db: db.execute("SELECT TakenAt FROM snapshot_meta").fetchone()[0])
+            except (sqlite3.Error, TypeError) as e:
+                print(f"⚠️ Ignoring unreadable offline snapshot {path}: {e}")
+
+    @property
+    def available(self) -> bool:
+        return self.taken_at is not None
+
+    def refresh(self, conn):
+        """Copy the tables from a MariaDB connection into a fresh file (blocking, run in a worker thread)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        taken_at = time.time()
+        db = sqlite3.connect(temp_path)
+        try:
+            db.executescript(SNAPSHOT_SCHEMA)
+            # Unbuffered cursor, copied in batches, so large tables never sit in memory whole
+            cursor = conn.cursor(mariadb.cursors.SSCursor)
+            for select, insert in SNAPSHOT_TABLES:
+                cursor.execute(select)
+                while True:
+                    rows = cursor.fetchmany(COPY_BATCH)
+                    if not rows:
+                        break
+                    db.executemany(insert, [[_snapshot_value(value) for value in row] for row in rows])
+            cursor.close()
+            db.execute("INSERT INTO snapshot_meta VALUES (?)", (taken_at,))
+            db.commit()
+        finally:
+            db.close()
+
+        os.replace(temp_path, self.path)
+        self.taken_at = taken_at
+
+    def _read(self, query):
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            return query(db)
+        finally:
+            db.close()
+
+    def _fetch(self, sql: str, params=()):
+        """Run a read against the snapshot, or None if there is no usable snapshot"""
+        if not self.available:
+            return None
+        try:
+            return self._read(lambda db: db.execute(sql, params).fetchall())
+        except sqlite3.Error as e:
+            print(f"Error reading offline snapshot: {e}")
+            return None
+
+    def _unavailable(self) -> dict:
+        return {"error": "Database connection failed and no offline copy is available"}
+
+    def warp_hall_stall(self, stall_number) -> dict:
+        rows = self._fetch("SELECT StallNumber, IGN, StallName FROM warp_hall WHERE StallNumber = ?", (stall_number,))
+        if rows is None:
+            return self._unavailable()
+        if not rows:
+            return {"error": f"No stall found with number {format_stall_number(stall_number)} in Warp Hall", "stale_as_of": self.taken_at}
+        return {**dict(zip(["StallNumber", "IGN", "StallName"], rows[0])), "stale_as_of": self.taken_at}
+
+    def mall_stall(self, stall_number, street_name: str) -> dict:
+        rows = self._fetch(
+            "SELECT StallNumber, StreetName, IGN, StallName, ItemsSold FROM the_mall WHERE StallNumber = ? AND StreetName = ?",
+            (str(parse_stall_number(stall_number)), street_name)
+        )
+        if rows is None:
+            return self._unavailable()
+        if not rows:
+            return {"error": f"No stall found with number {format_stall_number(stall_number)} on {street_name}", "stale_as_of": self.taken_at}
+        stall = dict(zip(["StallNumber", "StreetName", "IGN", "StallName", "ItemsSold"], rows[0]))
+        return {**stall, "StallNumber": parse_stall_number(stall["StallNumber"]), "stale_as_of": self.taken_at}
+
+    def mall_stall_count(self, stall_number) -> dict:
+        rows = self._fetch("SELECT COUNT(*) FROM the_mall WHERE StallNumber = ?", (str(parse_stall_number(stall_number)),))
+        if rows is None:
+            return self._unavailable()
+        if rows[0][0] == 0:
+            return {"error": f"No stall found with number {format_stall_number(stall_number)} in The Mall", "stale_as_of": self.taken_at}
+        return {"exists": True, "count": rows[0][0], "stale_as_of": self.taken_at}
+
+    def _stalls(self, table_name: str, conditions: list, params: list, order: str, limit: int) -> dict:
+        """Stall rows matching the conditions, with Mall stall numbers back as Decimal like MariaDB returns them"""
+        # Mall stall numbers are stored as text, so compare and sort them as numbers
+        number = "StallNumber" if table_name == "warp_hall" else "CAST(StallNumber AS REAL)"
+        columns = ["StallNumber", "IGN", "StallName"] if table_name == "warp_hall" else ["StallNumber", "StreetName", "IGN", "StallName"]
+        query = f"SELECT {', '.join(columns)} FROM {table_name}"
+        if conditions:
+            query += " WHERE " + " AND ".join(condition.format(number=number) for condition in conditions)
+        rows = self._fetch(query + f" ORDER BY {order.format(number=number)} LIMIT ?", (*params, limit))
+        if rows is None:
+            return self._unavailable()
+        stalls = [dict(zip(columns, row)) for row in rows]
+        if table_name == "the_mall":
+            for stall in stalls:
+                stall["StallNumber"] = parse_stall_number(stall["StallNumber"])
+        return {"stalls": stalls, "stale_as_of": self.taken_at}
+
+    def stall_page(self, table_name: str, street_name: str, cursor, limit: int) -> dict:
+        """Up to limit stalls after the (StreetName, StallNumber) cursor, in /stalllist order"""
+        conditions = []
+        params = []
+        if table_name == "warp_hall":
+            order = "{number}"
+            if cursor:
+                conditions.append("{number} > ?")
+                params.append(float(cursor[1]))
+        else:  # the_mall
+            order = "StreetName, {number}"
+            if street_name:
+                conditions.append("StreetName = ?")
+                params.append(street_name)
+            if cursor:
+                conditions.append("(StreetName > ? OR (StreetName = ? AND {number} > ?))")
+                params += [cursor[0], cursor[0], float(cursor[1])]
+        return self._stalls(table_name, conditions, params, order, limit)
+
+    def stall_batch(self, table_name: str, numbers: list, ranges: list, street_name: str, limit: int) -> dict:
+        """Up to limit stalls whose number is listed or inside an inclusive range, in /stallbatch order"""
+        matches = []
+        params = []
+        if numbers:
+            matches.append(f"{{number}} IN ({', '.join(['?'] * len(numbers))})")
+            params += [float(number) for number in numbers]
+        for low, high in ranges:
+            matches.append("{number} BETWEEN ? AND ?")
+            params += [float(low), float(high)]
+        conditions = [f"({' OR '.join(matches)})"]
+        if street_name:
+            conditions.append("StreetName = ?")
+            params.append(street_name)
+        order = "{number}" if table_name == "warp_hall" else "{number}, StreetName"
+        return self._stalls(table_name, conditions, params, order, limit)
+
+    def stall_reviews(self, stall_number, street_name: str, limit: int) -> dict:
+        stats = self._fetch(
+            "SELECT COUNT(*), COALESCE(SUM(Rating), 0) FROM the_mall_reviews WHERE StallNumber = ? AND StreetName = ?",
+            (str(parse_stall_number(stall_number)), street_name)
+        )
+        rows = self._fetch(
+            "SELECT ReviewID, ReviewerName, Rating, ReviewText FROM the_mall_reviews "
+            "WHERE StallNumber = ? AND StreetName = ? ORDER BY UpdatedAt DESC LIMIT ?",
+            (str(parse_stall_number(stall_number)), street_name, limit)
+        )
+        if stats is None or rows is None:
+            return self._unavailable()
+        columns = ["ReviewID", "ReviewerName", "Rating", "ReviewText"]
+        return {
+            "reviews": [dict(zip(columns, row)) for row in rows],
+            "count": stats[0][0],
+            "rating_total": stats[0][1],
+            "stale_as_of": self.taken_at
+        }
+
+
+def mark_stale(embed: discord.Embed, result: dict) -> discord.Embed:
+    """Flag an embed built from the offline snapshot so users know it may be out of date"""
+    if result.get("stale_as_of"):
+        embed.add_field(
+            name="⚠️ Offline Copy",
+            value=f"The database is unreachable. Showing data as of <t:{int(result['stale_as_of'])}:R>.",
+            inline=False
+        )
+    return embed
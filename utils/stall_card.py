@@ -0,0 +1,100 @@
+# Shared stall card rendering with a cache of pre-rendered embed payloads
+
+from collections import OrderedDict
+import discord
+
+from utils.stall_number import parse_stall_number
+
+FOOTER = "Furryville Index Database"
+
+# (field label, column, inline) per table, in display order
+STALL_FIELDS = {
+    "warp_hall": [
+        ("Stall Number", "StallNumber", True),
+        ("Owner IGN", "IGN", True),
+        ("Stall Name", "StallName", True),
+    ],
+    "the_mall": [
+        ("Stall Number", "StallNumber", True),
+        ("Street Name", "StreetName", True),
+        ("Owner IGN", "IGN", True),
+        ("Stall Name", "StallName", True),
+        ("Items Sold", "ItemsSold", True),
+    ],
+}
+
+CARD_TITLES = {
+    "warp_hall": "Warp Hall Stall",
+    "the_mall": "The Mall Stall",
+}
+
+CARD_COLOR = 0xffd966  # Yellow
+
+
+def format_stall_number(stall_number) -> str:
+    """Display a stall number without trailing zeros, so 12.50 shows as 12.5 and 12.00 as 12"""
+    try:
+        return format(parse_stall_number(stall_number).normalize(), "f")
+    except ValueError:
+        return str(stall_number)  # Placeholders like "Unknown"
+
+
+def build_stall_embed(table_name: str, stall_data: dict, title: str, color: int, wide_columns=()) -> discord.Embed:
+    """Build an embed listing a stall's fields. Columns in wide_columns get a full-width field"""
+    embed = discord.Embed(title=title, color=color)
+    for field_name, column, inline in STALL_FIELDS[table_name]:
+        if column == "StallNumber":
+            value = format_stall_number(stall_data.get(column, "Unknown"))
+        else:
+            value = stall_data.get(column, "Not Available")
+        embed.add_field(name=field_name, value=value, inline=inline and column not in wide_columns)
+    embed.set_footer(text=FOOTER)
+    return embed
+
+
+class StallCardRenderer:
+    """Caches each stall's rendered card payload, keyed by stall and checked against the row's version"""
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._cards = OrderedDict()  # (table, stall, street) -> (version, embed payload)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(table_name: str, stall_number, street_name=None):
+        # Canonical Decimal, so a DB value and a command argument for the same stall share one entry
+        return (table_name, parse_stall_number(stall_number), street_name if table_name == "the_mall" else None)
+
+    @staticmethod
+    def version(table_name: str, stall_data: dict):
+        """Fingerprint of the displayed columns; any change to the row renders a new card"""
+        return tuple(stall_data.get(column) for _, column, _ in STALL_FIELDS[table_name])
+
+    def render(self, table_name: str, stall_data: dict):
+        """Get the stall card embed, reusing the cached payload when the row hasn't changed"""
+        if table_name not in STALL_FIELDS:
+            return None
+
+        key = self.key(table_name, stall_data.get("StallNumber"), stall_data.get("StreetName"))
+        version = self.version(table_name, stall_data)
+        cached = self._cards.get(key)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            self._cards.move_to_end(key)
+            payload = cached[1]
+        else:
+            self.misses += 1
+            title = f"{CARD_TITLES[table_name]} #{format_stall_number(stall_data.get('StallNumber', 'Unknown'))}"
+            payload = build_stall_embed(table_name, stall_data, title, CARD_COLOR).to_dict()
+            self._cards[key] = (version, payload)
+            self._cards.move_to_end(key)
+            if len(self._cards) > self.max_size:
+                self._cards.popitem(last=False)
+
+        # Copy the field list so callers adding fields can't change the cached card
+        return discord.Embed.from_dict({**payload, "fields": [dict(field) for field in payload["fields"]]})
+
+    def invalidate(self, table_name: str, stall_number, street_name=None):
+        """Drop a stall's cached card after it's created or edited"""
+        self._cards.pop(self.key(table_name, stall_number, street_name), None)
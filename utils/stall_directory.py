@@ -0,0 +1,144 @@
+# In-memory copy of both stall tables, kept current by the change feed and the invalidation bus
+
+import threading
+import time
+
+from utils.change_feed import ChangeFeed
+from utils.stall_card import StallCardRenderer
+
+DIRECTORY_TABLES = ("warp_hall", "the_mall")
+
+
+class StallDirectory:
+    """Every stall row by key, so commands can answer without a database round trip
+
+    Filled by walking the change feed from version 0, then kept up by polling it. An invalidation
+    hides the key until the feed delivers a newer version, so a lookup either sees the latest row
+    or misses and goes to the database. If the newer version had already arrived before the
+    invalidation did, nothing newer comes, so a hidden key shows again after hold seconds.
+    """
+
+    def __init__(self, pool, hold: float = 30.0):
+        self.feeds = {table: ChangeFeed(pool, table) for table in DIRECTORY_TABLES}
+        self.hold = hold
+        self.ready = False  # Set after the first full load; lookups miss until then
+        self._rows = {}  # (table, stall, street) -> row with RowVersion
+        self._streets = {}  # Mall stall number -> streets it exists on
+        self._floors = {}  # Invalidated key -> (version when invalidated, monotonic time)
+        self._lock = threading.Lock()  # Synced from a worker thread, read from the event loop
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def sync(self) -> int:
+        """Apply every change since the last sync and return how many there were (blocking, run in a worker thread)"""
+        applied = 0
+        for table_name, feed in self.feeds.items():
+            changes = feed.poll()
+            with self._lock:
+                for change in changes:
+                    self._apply(table_name, change)
+            applied += len(changes)
+        with self._lock:
+            now = time.monotonic()
+            for key, (_, hidden_at) in list(self._floors.items()):
+                if now - hidden_at >= self.hold:
+                    self._floors.pop(key, None)
+        self.ready = True
+        return applied
+
+    def _apply(self, table_name: str, change: dict):
+        row = change["row"]
+        key = StallCardRenderer.key(table_name, row["StallNumber"], row.get("StreetName"))
+
+        # A poll that started before an edit committed can still hand back the pre-edit row
+        floor = self._floors.get(key)
+        if floor is not None:
+            if change["version"] <= floor[0]:
+                return
+            self._floors.pop(key, None)
+
+        # Late commits re-read below the feed's cursor can be older than what's already here
+        current = self._rows.get(key)
+        if current is not None and change["version"] <= current["RowVersion"]:
+            return
+
+        if change["deleted"]:
+            self._rows.pop(key, None)
+            if table_name == "the_mall":
+                streets = self._streets.get(key[1], set())
+                streets.discard(key[2])
+                if not streets:
+                    self._streets.pop(key[1], None)
+        else:
+            self._rows[key] = {**row, "RowVersion": change["version"]}
+            if table_name == "the_mall":
+                self._streets.setdefault(key[1], set()).add(key[2])
+
+    def _hidden(self, key) -> bool:
+        """Whether an invalidation still hides the key (caller holds the lock)"""
+        floor = self._floors.get(key)
+        if floor is None:
+            return False
+        if time.monotonic() - floor[1] < self.hold:
+            return True
+        self._floors.pop(key, None)
+        return False
+
+    def get(self, table_name: str, stall_number, street_name: str = None):
+        """A copy of the cached row, or None on a miss"""
+        key = StallCardRenderer.key(table_name, stall_number, street_name)
+        with self._lock:
+            row = self._rows.get(key) if self.ready and not self._hidden(key) else None
+            row = dict(row) if row is not None else None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def streets(self, stall_number) -> list:
+        """Streets a Mall stall number is cached on, empty on a miss"""
+        stall_number = StallCardRenderer.key("the_mall", stall_number)[1]
+        if not self.ready:
+            return []
+        with self._lock:
+            # While one of its streets is invalidated the list may be wrong, so count it as a miss
+            if any(key[0] == "the_mall" and key[1] == stall_number and self._hidden(key) for key in list(self._floors)):
+                return []
+            streets = set(self._streets.get(stall_number, ()))
+        return sorted(streets)
+
+    def search(self, table_name: str, numbers=(), ranges=(), street_name: str = None):
+        """Cached rows whose stall number is one of numbers or inside an inclusive (low, high) range
+
+        Sorted by stall number, then street. Once loaded the directory holds every stall, so a
+        stall that isn't here doesn't exist; returns None (a miss) only before the first load or
+        while one of the table's keys is invalidated.
+        """
+        wanted = set(numbers)
+        with self._lock:
+            if not self.ready or any(key[0] == table_name and self._hidden(key) for key in list(self._floors)):
+                self.misses += 1
+                return None
+            keys = sorted(
+                (key for key in self._rows
+                 if key[0] == table_name
+                 and (street_name is None or key[2] == street_name)
+                 and (key[1] in wanted or any(low <= key[1] <= high for low, high in ranges))),
+                key=lambda key: (key[1], key[2] or "")
+            )
+            rows = [dict(self._rows[key]) for key in keys]
+        self.hits += 1
+        return rows
+
+    def invalidate(self, table_name: str, stall_number, street_name=None):
+        """Hide a stall until the change feed brings its new version"""
+        if table_name not in DIRECTORY_TABLES:
+            return
+        key = StallCardRenderer.key(table_name, stall_number, street_name)
+        with self._lock:
+            row = self._rows.get(key)
+            self._floors[key] = (row["RowVersion"] if row else 0, time.monotonic())
@@ -0,0 +1,82 @@
+# Canonical stall numbers: exact Decimals matching the DECIMAL(10, 2) columns (see database/stall_number_decimal.sql)
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+import discord
+from discord import app_commands
+
+STALL_NUMBER_PLACES = 2
+STALL_NUMBER_QUANTUM = Decimal(1).scaleb(-STALL_NUMBER_PLACES)  # 0.01
+STALL_NUMBER_LIMIT = Decimal(10) ** (10 - STALL_NUMBER_PLACES)  # DECIMAL(10, 2) holds up to 99999999.99
+
+
+def parse_stall_number(value) -> Decimal:
+    """Canonical key for a stall number from user input, a custom_id, a float or a DB value
+
+    Floats go through their shortest repr, so 2.1 becomes Decimal("2.10") rather than
+    2.100000000000000088817841970012523. Equal stalls always give equal, equally hashed keys.
+    Raises ValueError with a user-facing message for anything that isn't a number the column can
+    hold exactly: never rounds, since 2.125 and 2.12 are different stalls to the person typing them.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError) as e:
+        raise ValueError(f"`{value}` is not a stall number.") from e
+    if not number.is_finite():
+        raise ValueError(f"`{value}` is not a stall number.")
+    if abs(number) >= STALL_NUMBER_LIMIT:
+        raise ValueError(f"Stall numbers must be below {STALL_NUMBER_LIMIT}.")
+    quantized = number.quantize(STALL_NUMBER_QUANTUM, rounding=ROUND_HALF_EVEN)
+    if quantized != number:
+        raise ValueError(f"Stall numbers can have at most {STALL_NUMBER_PLACES} decimal places, `{value}` has more.")
+    return quantized
+
+
+def is_whole_number(stall_number: Decimal) -> bool:
+    return stall_number == stall_number.to_integral_value()
+
+
+class StallNumberTransformer(app_commands.Transformer):
+    """Keeps the Discord option a plain number but hands the command a canonical Decimal"""
+
+    @property
+    def type(self) -> discord.AppCommandOptionType:
+        return discord.AppCommandOptionType.number
+
+    async def transform(self, interaction: discord.Interaction, value) -> Decimal:
+        return parse_stall_number(value)
+
+
+MAX_SPEC_PARTS = 20
+
+
+def parse_stall_spec(text: str) -> tuple:
+    """Parse a list and/or ranges of stall numbers like "10-25" or "3, 7, 9.5" into (numbers, ranges)
+
+    numbers is a sorted list of canonical stall numbers and ranges a list of inclusive (low, high)
+    pairs. Raises ValueError with a user-facing message for anything malformed.
+    """
+    parts = [part.strip() for part in text.split(",") if part.strip()]
+    if not parts:
+        raise ValueError("Enter at least one stall number, e.g. `10-25` or `3, 7, 9.5`.")
+    if len(parts) > MAX_SPEC_PARTS:
+        raise ValueError(f"Enter at most {MAX_SPEC_PARTS} numbers or ranges.")
+
+    numbers = set()
+    ranges = []
+    for part in parts:
+        low, dash, high = part.partition("-")
+        if not dash:
+            numbers.add(parse_stall_number(part))
+            continue
+        if not low.strip() or not high.strip():
+            raise ValueError(f"`{part}` is not a stall number or range.")
+        low, high = parse_stall_number(low.strip()), parse_stall_number(high.strip())
+        if low > high:
+            raise ValueError(f"Range `{part}` goes backwards.")
+        ranges.append((low, high))
+
+    if any(number <= 0 for number in numbers) or any(low <= 0 for low, _ in ranges):
+        raise ValueError("Stall numbers must be positive.")
+    return sorted(numbers), ranges
@@ -0,0 +1,26 @@
+# The Mall street names and the matching slash command autocomplete
+
+import discord
+from discord import app_commands
+
+VALID_STREETS = [
+    "Wall Street",
+    "Artist Alley",
+    "Woke Ave",
+    "Five",
+    "Poland Street"
+]
+
+
+class StreetNameTransformer(app_commands.Transformer):
+    """Transformer for street name autocomplete"""
+
+    async def transform(self, interaction: discord.Interaction, value: str) -> str:
+        return value
+
+    async def autocomplete(self, interaction: discord.Interaction, value: str) -> list[app_commands.Choice[str]]:
+        return [
+            app_commands.Choice(name=street, value=street)
+            for street in VALID_STREETS
+            if value.lower() in street.lower()
+        ][:25]
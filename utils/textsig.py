@@ -0,0 +1,105 @@
+# SimHash fingerprints and an LSH index for spotting near-duplicate review text
+
+import hashlib
+import re
+from collections import OrderedDict
+
+WORD_RE = re.compile(r"\w+")
+SHINGLE_SIZE = 3
+
+# 64 bits split into 6 bands (four of 11 bits, two of 10). Any two fingerprints within
+# 5 bits of each other agree exactly on at least one band (pigeonhole)
+BAND_WIDTHS = (11, 11, 11, 11, 10, 10)
+BAND_SLICES = [(sum(BAND_WIDTHS[:i]), (1 << width) - 1) for i, width in enumerate(BAND_WIDTHS)]
+
+
+def words(text: str) -> list:
+    """Lowercased words with punctuation and spacing stripped, so trivial edits don't change the fingerprint"""
+    return WORD_RE.findall(text.lower())
+
+
+def simhash(tokens: list) -> int:
+    """64-bit SimHash over word shingles. Near-identical texts land a few bits apart"""
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+    hashes = [format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big"), "064b") for s in shingles]
+
+    # Majority vote per bit; zip(*hashes) walks bit columns in C instead of a 64 x n Python loop
+    half = len(hashes) / 2
+    fingerprint = 0
+    for column in zip(*hashes):
+        fingerprint = (fingerprint << 1) | (column.count("1") > half)
+    return fingerprint
+
+
+class SimHashIndex:
+    """Bounded index of recent fingerprints, banded so lookups only compare against likely matches
+
+    A lookup is one dict probe per band plus a popcount per candidate; random fingerprints
+    collide on a band roughly once per thousand entries, so candidate lists stay short.
+    """
+
+    def __init__(self, capacity: int = 50000, max_distance: int = 5):
+        self.capacity = capacity
+        self.max_distance = min(max_distance, len(BAND_WIDTHS) - 1)  # Beyond this, banding can miss matches
+        self.loaded = False
+        self.loader = None  # Task filling the index at startup
+        self._entries = OrderedDict()  # key -> (fingerprint, meta), oldest first
+        self._bands = [{} for _ in BAND_WIDTHS]  # band value -> set of keys
+
+    @staticmethod
+    def _band_values(fingerprint: int):
+        return [(fingerprint >> shift) & mask for shift, mask in BAND_SLICES]
+
+    def add(self, key, fingerprint: int, meta=None):
+        """Add or replace a fingerprint, evicting the oldest entry when full"""
+        self.remove(key)
+        self._entries[key] = (fingerprint, meta)
+        for band, value in zip(self._bands, self._band_values(fingerprint)):
+            band.setdefault(value, set()).add(key)
+
+        while len(self._entries) > self.capacity:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band, value in zip(self._bands, self._band_values(entry[0])):
+            keys = band.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del band[value]
+
+    def rekey(self, key, new_key):
+        """Move an entry to a new key, keeping its fingerprint"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.remove(key)
+            self.add(new_key, *entry)
+
+    def keys(self) -> list:
+        return list(self._entries)
+
+    def find_similar(self, fingerprint: int, exclude=None) -> list:
+        """Entries within max_distance bits of fingerprint, as (key, meta, distance), closest first"""
+        candidates = set()
+        for band, value in zip(self._bands, self._band_values(fingerprint)):
+            candidates.update(band.get(value, ()))
+        candidates.discard(exclude)
+
+        matches = []
+        for key in candidates:
+            other, meta = self._entries[key]
+            distance = (fingerprint ^ other).bit_count()
+            if distance <= self.max_distance:
+                matches.append((key, meta, distance))
+        matches.sort(key=lambda match: match[2])
+        return matches
+
+    def __len__(self):
+        return len(self._entries)